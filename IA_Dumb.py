@@ -6,6 +6,9 @@ import time
 import math
 from datetime import datetime
 
+from rules_manager import get_rules
+from terrain_analysis import TerrainAnalysis
+
 # --- CONFIGURATION ---
 _H, _W = 10, 15
 _cells = _H * _W
@@ -121,7 +124,8 @@ def load_rules(filename="Rules.json"):
       5. Parent of parent (two levels up)
       6. Path from environment variable TERRAPOLIS_RULES_PATH
 
-    Returns parsed JSON dict or None on failure (prints helpful message).
+    Returns the compiled rules (rules_manager.CompiledRules, shared and cached by mtime)
+    or None on failure (prints helpful message).
     """
     candidates = []
     # if given as absolute or relative path directly, prefer it
@@ -149,10 +153,9 @@ def load_rules(filename="Rules.json"):
         tried.append(p_norm)
         if os.path.exists(p_norm):
             try:
-                with open(p_norm, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    print(f"Loaded Rules.json from: {p_norm}")
-                    return data
+                rules = get_rules(p_norm)
+                print(f"Loaded Rules.json from: {p_norm}")
+                return rules
             except json.JSONDecodeError as e:
                 print(f"ERREUR: Fichier trouvé mais JSON invalide at {p_norm}: {e}")
                 return None
@@ -167,6 +170,20 @@ def load_rules(filename="Rules.json"):
     return None
 # --- FONCTIONS ---
 
+def _placement_mask(rules, tile_layers, H=_H, W=_W):
+    """Masque (nb_IDs, H, W) des cases autorisées par les règles compilées, ou None sans règles.
+    Tuiles interdites + adjacence requise, mêmes critères que _detect_tile_at (river > mountain > forest > plain).
+    """
+    if rules is None: return None
+    ids = TerrainAnalysis(tile_layers).ids if tile_layers else np.zeros((H, W), dtype=np.uint8)
+    return rules.placement_mask(ids)
+
+
+def _is_allowed(placement, rules, bname, r, c):
+    if placement is None or bname not in rules.ids: return True
+    return bool(placement[rules.ids[bname], r, c])
+
+
 def _detect_tile_at(tile_layers, r, c):
     """Retourne le type de tuile à la position r,c.
     Ordre de priorité : river > mountain > forest > plain.
@@ -436,44 +453,11 @@ def compute_signed_action_matrices(building_matrices=None, tile_layers=None, rul
 
     chosen = None
 
-    # 3. Sélection avec règles JSON chargées
+    # 3. Sélection avec règles JSON chargées (masque compilé une fois pour toute la carte)
+    placement = _placement_mask(rules, tile_layers, H, W)
     for abs_val, real_val, bname, r, c in candidates:
-        allowed = True
-        if rules is not None:
-            b_rules = rules.get('buildings', {}).get(bname, {})
-            placement = b_rules.get('placement', {})
-            
-            # A. Vérification : Tuile Interdite (Forbidden Tiles)
-            current_tile = _detect_tile_at(tile_layers, r, c)
-            forbidden = placement.get('placementForbiddenTiles', [])
-            
-            if forbidden and current_tile in forbidden:
-                allowed = False
-            
-            # B. Vérification : Adjacence Requise (RequiresAdjacentTile)
-            # Certains fichiers de règles indiquent 'operatesIfAdjacentTo' (ex: scierie,
-            # carrière) pour signifier que l'établissement fonctionne seulement
-            # s'il est adjacent à tel type de tuile. Ici on considère que si
-            # 'placementRequiresAdjacentTile' est présent OR 'operatesIfAdjacentTo'
-            # est présent, alors l'adjacence doit être vérifiée au placement.
-            if allowed and (not placement.get('placementAllowedAnywhere', True) or placement.get('operatesIfAdjacentTo')):
-                required_adj_types = placement.get('placementRequiresAdjacentTile', []) + placement.get('operatesIfAdjacentTo', [])
-                
-                if not required_adj_types:
-                    allowed = False
-                else:
-                    has_valid_neighbor = False
-                    for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                        rr, cc = r + dr, c + dc
-                        if 0 <= rr < H and 0 <= cc < W:
-                            neigh_tile = _detect_tile_at(tile_layers, rr, cc)
-                            if neigh_tile in required_adj_types:
-                                has_valid_neighbor = True
-                                break
-                    
-                    if not has_valid_neighbor:
-                        allowed = False
-            
+        allowed = _is_allowed(placement, rules, bname, r, c)
+
         if allowed:
             chosen = (real_val, bname, r, c)
             break
@@ -540,32 +524,9 @@ def apply_candidates_with_rules(candidates, tile_layers, rules, H, W):
     outputs = {b: np.zeros((H, W), dtype=int) for b in _building_names}
     chosen = None
 
+    placement = _placement_mask(rules, tile_layers, H, W)
     for abs_val, real_val, bname, r, c in candidates:
-        allowed = True
-        if rules is not None:
-            b_rules = rules.get('buildings', {}).get(bname, {})
-            placement = b_rules.get('placement', {})
-
-            current_tile = _detect_tile_at(tile_layers, r, c)
-            forbidden = placement.get('placementForbiddenTiles', [])
-            if forbidden and current_tile in forbidden:
-                allowed = False
-
-            if allowed and (not placement.get('placementAllowedAnywhere', True) or placement.get('operatesIfAdjacentTo')):
-                required_adj_types = placement.get('placementRequiresAdjacentTile', []) + placement.get('operatesIfAdjacentTo', [])
-                if not required_adj_types:
-                    allowed = False
-                else:
-                    has_valid_neighbor = False
-                    for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                        rr, cc = r + dr, c + dc
-                        if 0 <= rr < H and 0 <= cc < W:
-                            neigh_tile = _detect_tile_at(tile_layers, rr, cc)
-                            if neigh_tile in required_adj_types:
-                                has_valid_neighbor = True
-                                break
-                    if not has_valid_neighbor:
-                        allowed = False
+        allowed = _is_allowed(placement, rules, bname, r, c)
 
         if allowed:
             sign = 1 if real_val >= 0 else -1
@@ -688,6 +649,7 @@ if __name__ == "__main__" and rules:
 
     # 2.c Construire la liste de candidats triée par magnitude (ignore les règles pour ce tri)
     candidates = get_sorted_candidates(building_matrices)
+    placement = _placement_mask(rules, tile_layers_data, H, W)
 
     # 2.d Appliquer les règles maintenant, uniquement au moment d'écrire dans la copie vide
     # Boucle dynamique : on réitère l'expérience en reprenant les matrices mises à jour
@@ -792,37 +754,10 @@ if __name__ == "__main__" and rules:
                 neg_ban[bname][:] = neg_ban[bname]
 
             # --- Filtrage par Rules.json (met à 0 les zones inconstructibles) ---
-            if rules is not None:
-                b_rules = rules.get('buildings', {}).get(bname, {})
-                placement = b_rules.get('placement', {})
-
-                # A. Interdire les tuiles explicites
-                forbidden = placement.get('placementForbiddenTiles', [])
-                if forbidden:
-                    for r0 in range(H):
-                        for c0 in range(W):
-                            t = _detect_tile_at(tile_layers_data, r0, c0)
-                            if t in forbidden:
-                                pos[r0, c0] = 0
-                                neg[r0, c0] = 0
-
-                # B. Exiger l'adjacence
-                if (not placement.get('placementAllowedAnywhere', True)) or placement.get('operatesIfAdjacentTo'):
-                    required_adj_types = placement.get('placementRequiresAdjacentTile', []) + placement.get('operatesIfAdjacentTo', [])
-                    if required_adj_types:
-                        for r0 in range(H):
-                            for c0 in range(W):
-                                has_valid_neighbor = False
-                                for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                                    rr, cc = r0 + dr, c0 + dc
-                                    if 0 <= rr < H and 0 <= cc < W:
-                                        neigh_tile = _detect_tile_at(tile_layers_data, rr, cc)
-                                        if neigh_tile in required_adj_types:
-                                            has_valid_neighbor = True
-                                            break
-                                if not has_valid_neighbor:
-                                    pos[r0, c0] = 0
-                                    neg[r0, c0] = 0
+            if placement is not None and bname in rules.ids:
+                blocked = ~placement[rules.ids[bname]]
+                pos[blocked] = 0
+                neg[blocked] = 0
 
             # =================================================================
             # --- FIX DÉMARRAGE À FROID (COLD START) ---
@@ -935,30 +870,8 @@ if __name__ == "__main__" and rules:
             
             # --- FIN SKIP ---
 
-            allowed = True
             # Double vérification Rules (redondante mais sécuritaire)
-            if rules is not None:
-                b_rules = rules.get('buildings', {}).get(b_try, {})
-                placement = b_rules.get('placement', {})
-                current_tile = _detect_tile_at(tile_layers_data, r, c)
-                forbidden = placement.get('placementForbiddenTiles', [])
-                if forbidden and current_tile in forbidden:
-                    allowed = False
-                if allowed and (not placement.get('placementAllowedAnywhere', True) or placement.get('operatesIfAdjacentTo')):
-                    required_adj_types = placement.get('placementRequiresAdjacentTile', []) + placement.get('operatesIfAdjacentTo', [])
-                    if not required_adj_types:
-                        allowed = False
-                    else:
-                        has_valid_neighbor = False
-                        for dr, dc in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                            rr, cc = r + dr, c + dc
-                            if 0 <= rr < H and 0 <= cc < W:
-                                neigh_tile = _detect_tile_at(tile_layers_data, rr, cc)
-                                if neigh_tile in required_adj_types:
-                                    has_valid_neighbor = True
-                                    break
-                        if not has_valid_neighbor:
-                            allowed = False
+            allowed = _is_allowed(placement, rules, b_try, r, c)
 
             if not allowed:
                 print(f"[Iter {iteration}] Candidat refusé: {b_try} at ({r+1},{c+1}) (rules)")
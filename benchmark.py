@@ -0,0 +1,123 @@
+# benchmark.py
+# Micro-benchmarks des chemins chauds (commande : python benchmark.py)
+import copy
+import random
+import timeit
+
+import numpy as np
+
+from flood import grow_flood
+from pollution_diffusion import PollutionDiffusion, spread_kernel
+from state_stream import StateStream, apply_message
+from terrain_analysis import TERRAIN_IDS, TerrainAnalysis
+from terrapolis_logic import TerrapolisGame
+import wire
+
+
+def _played_game(turns=30, seed=0):
+    """Partie de référence avec quelques bâtiments posés."""
+    random.seed(seed)
+    game = TerrapolisGame()
+    game.wood, game.stone = 5000, 5000
+    for _ in range(turns):
+        game.step(random.choice(game.get_legal_actions()))
+    return game
+
+
+def _report(label, seconds, number):
+    print(f"  {label:<28}: {seconds / number * 1e6:8.2f} µs")
+
+
+def bench_copy(number=5000):
+    print("=== COPIE D'ÉTAT (TerrapolisGame) ===")
+    game = _played_game()
+    snap = game.snapshot()
+    _report("copy.deepcopy", timeit.timeit(lambda: copy.deepcopy(game), number=number), number)
+    _report("TerrapolisGame.copy", timeit.timeit(game.copy, number=number), number)
+    _report("snapshot()", timeit.timeit(game.snapshot, number=number), number)
+    _report("restore(snapshot)", timeit.timeit(lambda: game.restore(snap), number=number), number)
+
+
+
+def bench_lookahead(number=200):
+    print("=== LOOKAHEAD 1 COUP (toutes les actions légales) ===")
+    game = _played_game()
+    actions = game.get_legal_actions()
+
+    def with_copy():
+        for a in actions:
+            game.copy().step(a)
+
+    def with_undo():
+        for a in actions:
+            game.undo(game.apply(a))
+
+    print(f"  ({len(actions)} actions par noeud)")
+    _report("copy() + step()", timeit.timeit(with_copy, number=number), number)
+    _report("apply() + undo()", timeit.timeit(with_undo, number=number), number)
+
+
+def bench_diffusion(size=512, number=5):
+    print(f"=== DIFFUSION DE LA POLLUTION (carte {size}x{size}) ===")
+    emission = np.random.default_rng(0).random((size, size))
+    for radius in (1, 4, 16, 64):
+        diffusion = PollutionDiffusion(spread_kernel(radius))
+        seconds = timeit.timeit(lambda: diffusion.apply(emission), number=number)
+        _report(f"rayon {radius:<3} ({diffusion.method})", seconds, number)
+
+
+def _river_terrain(size, seed=0):
+    """Plaine traversée de haut en bas par une rivière sinueuse de largeur 2."""
+    rng = np.random.default_rng(seed)
+    ids = np.full((size, size), TERRAIN_IDS["plain"], dtype=np.uint8)
+    x = size // 2
+    for y in range(size):
+        x = int(np.clip(x + rng.integers(-2, 3), 1, size - 2))
+        ids[y, x - 1:x + 1] = TERRAIN_IDS["river"]
+    return TerrainAnalysis.from_ids(ids)
+
+
+def bench_flood(number=20):
+    print("=== GÉNÉRATION DE CRUE (rivière sinueuse, moitié des berges inondée) ===")
+    for size in (15, 256, 1024):
+        terrain = _river_terrain(size)
+        target = len(terrain.bank_cells) // 2
+        rng = random.Random(0)
+        seconds = timeit.timeit(lambda: grow_flood(terrain.flood_candidates, target, rng, terrain.bank_cells), number=number)
+        _report(f"{size}x{size} ({len(terrain.bank_cells)} berges)", seconds, number)
+
+
+def bench_wire(cells=150, changed=5, number=5000):
+    print(f"=== FORMAT DES MESSAGES D'ÉTAT ({cells} cases, {changed} modifiées par delta) ===")
+    rng = np.random.default_rng(0)
+    codes = rng.choice([1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 99], size=cells)
+    moved = codes.copy()
+    moved[rng.choice(cells, changed, replace=False)] = 99
+    resources = {"wood": 1234, "stones": 567, "virtuosity": 89012}
+    for binary in (False, True):
+        name = "binaire" if binary else "texte"
+
+        def full():
+            stream = StateStream(binary=binary)
+            return stream.encode(codes, resources)
+
+        def delta():
+            stream = StateStream(binary=binary)
+            stream.encode(codes, resources)
+            return stream.encode(moved, resources)
+
+        for label, build in (("FULL", full), ("DELTA", delta)):
+            message = build()
+            grid = None if label == "FULL" else codes
+            _report(f"{label:<5} {name:<7} enc. {len(message):>3} o", timeit.timeit(build, number=number), number)
+            _report(f"{label:<5} {name:<7} décodage", timeit.timeit(lambda: apply_message(grid, message), number=number), number)
+    command = wire.encode_command("BUILD,42,6")
+    _report(f"BUILD binaire  déc. {len(command):>3} o", timeit.timeit(lambda: wire.decode_command(command), number=number), number)
+
+
+if __name__ == "__main__":
+    bench_copy()
+    bench_lookahead()
+    bench_diffusion()
+    bench_flood()
+    bench_wire()
@@ -4,17 +4,27 @@ import sys
 import os
 import random
 import math
+import time
 from datetime import datetime
 
 import torch
 
 import network
 import settings as cfg
+from sim_clock import RealClock, VirtualClock
 from terrain_data import MapTemplates
-from rules_manager import BUILDING_RULES, ADJACENT_MODIFIERS
+from rules_manager import RULES, reload_rules
+from terrain_analysis import TERRAINS, TERRAIN_IDS, TerrainAnalysis
+from pollution_diffusion import PollutionDiffusion
+from scheduler import Scheduler
+from flood import grow_flood
+from text_cache import TextCache
+from frame_stats import FrameStats
+from state_stream import StateStream
+from outbox import Outbox
 import map as map_ai
 
-from terrapolis_logic import TerrapolisGame
+from terrapolis_logic import TerrapolisGame, BUILDING_IDS
 from terrapolis_models import CityCNN
 
 BUILDING_TO_ID = {
@@ -28,27 +38,105 @@ BUILDING_TO_ID = {
 
 ID_TO_BUILDING = {v: k for k, v in BUILDING_TO_ID.items()}
 
+_shared_ai = None
+
+def _load_shared_ai():
+    """(moteur map.py, modèle CityCNN ou None, device), chargés au premier appel puis réutilisés."""
+    global _shared_ai
+    if _shared_ai is not None: return _shared_ai
+    ai_engine = map_ai.TerrapolisAI()
+
+    print("Chargement du modèle Deep Learning...")
+    ai_model = None
+    ai_device = torch.device("cpu") 
+    
+    model_path = os.path.join("save_terrapolis_models", "model_best.pt")
+    
+    # --- PYTORCH 2.6 SECURITY FIX ---
+    # We whitelist the classes needed to load the model securely
+    torch.serialization.add_safe_globals([CityCNN, torch.nn.Conv2d, torch.nn.Linear, torch.nn.Dropout, torch.nn.ReLU])
+
+    if os.path.exists(model_path):
+        try:
+            # Try secure load first
+            ai_model = torch.load(model_path, map_location=ai_device, weights_only=True)
+            print("✅ IA Intelligente chargée (Secure Mode)")
+        except:
+            try:
+                # Fallback to unsafe load if secure fails (local trusted file)
+                ai_model = torch.load(model_path, map_location=ai_device, weights_only=False)
+                print("⚠️ IA Intelligente chargée (Unsafe Mode)")
+                
+                # Fix for older models missing dropout layer
+                if not hasattr(ai_model, 'dropout'):
+                    ai_model.dropout = torch.nn.Dropout(p=0.3)
+            except Exception as e:
+                print(f"❌ Erreur critique chargement IA : {e}")
+        
+        if ai_model:
+            ai_model.eval()
+    else:
+        print(f"⚠️ Modèle introuvable à : {model_path}")
+    _shared_ai = (ai_engine, ai_model, ai_device)
+    return _shared_ai
+
+
 class Game:
-    def __init__(self):
+    def __init__(self, headless=False, clock=None, flood_seed=None, server=None, session_id=None):
+        # Mode serveur : simulation, réseau et IA sans fenêtre ni rendu (client Unity seul)
+        self.headless = headless
+        # Partie d'une session (sessions.SessionHost) : sauvegardes suffixées par la session, et pas de
+        # pont fichiers avec map.py (action.txt / matrix_state.txt n'existent qu'une fois par processus)
+        self.session_id = session_id
+        self.file_bridge = session_id is None
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
         pygame.init()
-        self._init_display()
-        self._init_fonts()
-        self._init_assets()
+        # Règles compilées en service, remplacées à chaud par _check_rules_reload
+        self.rules = RULES
+        self.rules_rejected_mtime = None
+        self.diffusion = self._build_diffusion()
+        self.last_rules_check_time = 0
+        # Horloge injectable : RealClock (temps réel) ou VirtualClock (accéléré, tests)
+        self.clock = clock if clock is not None else RealClock()
+        # Tirages des crues (nombre, dates, zones) : reproductibles si flood_seed est fourni, sinon module random global
+        self.flood_rng = random.Random(flood_seed) if flood_seed is not None else random
+        # Minuteries d'interface, en millisecondes d'horloge (expiration des suggestions IA)
+        self.ui_timers = Scheduler()
+        self.ai_suggestion_event = None
+        if not headless:
+            self._init_display()
+            self._init_fonts()
+            self._init_assets()
         self._init_io()
+        self.state_streams = {}   # addr -> StateStream des clients ayant choisi READY,DELTA et/ou READY,BINARY
+        self.outbox = Outbox(cfg.POPUP_MIN_INTERVAL)   # Cartes et popups regroupés, envoyés une fois par frame
         self.reset_game()
 
-        self.network = network.TerrapolisServer(self)
-        self.mobile_addr = None
+        # Serveur UDP propre, ou canal d'une session (sessions.SessionHost : un socket pour plusieurs parties)
+        self.network = server if server is not None else network.TerrapolisServer(self)
+        self.mobile_address = None
 
     def _init_display(self):
         # La taille de l'écran est maintenant la somme de la bande AR + la carte + le menu
         self.screen = pygame.display.set_mode((cfg.SCREEN_WIDTH, cfg.SCREEN_HEIGHT))
         pygame.display.set_caption("City Builder - Terrapolis AR")
-        self.clock = pygame.time.Clock()
 
         # On prépare l'image de la bande latérale AR
         self.qr_sidebar_surface = self._load_ar_marker_image()
 
+        # Calques de la carte (coordonnées locales) : terrain seul, et carte complète (terrain + ressources + bâtiments)
+        map_size = (cfg.MAP_WIDTH * cfg.TILE_SIZE, cfg.MAP_HEIGHT * cfg.TILE_SIZE)
+        self.terrain_layer = pygame.Surface(map_size)
+        self.map_layer = pygame.Surface(map_size)
+        self.qr_rect = pygame.Rect(0, 0, cfg.QR_MARGIN_WIDTH, cfg.SCREEN_HEIGHT)
+        self.map_rect = pygame.Rect(cfg.MAP_OFFSET_X, cfg.MAP_OFFSET_Y, *map_size)
+        self.sidebar_rect = pygame.Rect(self.map_rect.right, 0, cfg.SCREEN_WIDTH - self.map_rect.right, cfg.SCREEN_HEIGHT)
+        self.modal_was_active = False
+        self.frame_stats = FrameStats()
+        self.frame_stats_interval = cfg.FRAME_STATS_INTERVAL
+        self.last_frame_stats_time = 0
+
     def _load_ar_marker_image(self):
         """Charge l'image du marqueur AR et la redimensionne."""
         target_width = cfg.QR_MARGIN_WIDTH
@@ -91,6 +179,8 @@ class Game:
             self.icon_font = pygame.font.SysFont("Segoe UI Emoji", 32)
         except:
             self.icon_font = pygame.font.SysFont("Arial", 32)
+        # Textes rendus partagés par toutes les routines de dessin (seuls les textes modifiés sont re-rendus)
+        self.text = TextCache(cfg.TEXT_CACHE_SIZE)
 
     def _init_assets(self):
         self.building_sprites = {}
@@ -112,49 +202,18 @@ class Game:
                         print(f"Erreur image {filename}: {e}")
 
     def _init_io(self):
-        self.ai_engine = map_ai.TerrapolisAI()
-        if os.path.exists("action.txt"):
+        if self.file_bridge and os.path.exists("action.txt"):
             try: os.remove("action.txt")
             except: pass
-        
-        print("Chargement du modèle Deep Learning...")
-        self.ai_model = None
-        self.ai_device = torch.device("cpu") 
-        
-        model_path = os.path.join("save_terrapolis_models", "model_best.pt")
-        
-        # --- PYTORCH 2.6 SECURITY FIX ---
-        # We whitelist the classes needed to load the model securely
-        torch.serialization.add_safe_globals([CityCNN, torch.nn.Conv2d, torch.nn.Linear, torch.nn.Dropout, torch.nn.ReLU])
-
-        if os.path.exists(model_path):
-            try:
-                # Try secure load first
-                self.ai_model = torch.load(model_path, map_location=self.ai_device, weights_only=True)
-                print("✅ IA Intelligente chargée (Secure Mode)")
-            except:
-                try:
-                    # Fallback to unsafe load if secure fails (local trusted file)
-                    self.ai_model = torch.load(model_path, map_location=self.ai_device, weights_only=False)
-                    print("⚠️ IA Intelligente chargée (Unsafe Mode)")
-                    
-                    # Fix for older models missing dropout layer
-                    if not hasattr(self.ai_model, 'dropout'):
-                        self.ai_model.dropout = torch.nn.Dropout(p=0.3)
-                except Exception as e:
-                    print(f"❌ Erreur critique chargement IA : {e}")
-            
-            if self.ai_model:
-                self.ai_model.eval()
-        else:
-            print(f"⚠️ Modèle introuvable à : {model_path}")
+        # Moteur IA et modèle chargés une seule fois par processus (partagés entre sessions)
+        self.ai_engine, self.ai_model, self.ai_device = _load_shared_ai()
 
     # --- INITIALISATION ET RESET ---
 
     def reset_game(self):
         self.resources = {"wood": 0, "stones": 0, "virtuosity": 0}
-        self.building_counts = {k: 0 for k in BUILDING_RULES.keys()}
-        self.destroyed_counts = {k: 0 for k in BUILDING_RULES.keys()}
+        self.building_counts = {k: 0 for k in self.rules.buildings.keys()}
+        self.destroyed_counts = {k: 0 for k in self.rules.buildings.keys()}
         self.forests_destroyed_count = 0
         self.selected_building = None
         self.retry_rect = None
@@ -164,29 +223,45 @@ class Game:
         self.popup_data = {}
         self.popup_rect_ok = None
         self.popup_rect_cancel = None
-        self.last_production_time = pygame.time.get_ticks()
-        self.last_matrix_save_time = pygame.time.get_ticks()
-        self.last_action_check_time = pygame.time.get_ticks()
+        # Horloge de simulation (pas fixe SIM_DT, indépendante du rendu)
+        self.sim_time = 0.0
+        self.sim_accumulator = 0.0
+        self.production_timer = 0.0
+        self.last_matrix_save_time = 0
+        self.last_action_check_time = 0
         self.last_action_file_date = ""
         self.time_left = cfg.GAME_DURATION
         self.game_over = False
         self.final_stats = {}
         self.ai_suggestion = None
-        self.ai_suggestion_end_time = 0
+        self.ui_timers.cancel(self.ai_suggestion_event)
+        # Rendu : tout est redessiné à la première frame de la partie
+        self.tile_state = None      # Signature des tuiles présentes dans map_layer
+        for stream in self.state_streams.values(): stream.request_keyframe()
+        self.overlay_rects = []     # Zones couvertes par les surimpressions de la frame précédente
+        self.full_redraw = True
+        # Minuteries de simulation, en secondes de sim_time (délais des bâtiments, fin de crue)
+        self.timers = Scheduler()
+        self.cell_timers = {}   # (x, y) -> minuteries en attente du bâtiment de la case
         self.flooded_grid = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), dtype=bool)
-        self.max_floods_game = random.randint(0, 2)
+        self.max_floods_game = self.flood_rng.randint(0, 2)
         self.floods_occurred = 0
-        self.next_flood_time = random.randint(cfg.FLOOD_MIN_INTERVAL, cfg.FLOOD_MAX_INTERVAL)
+        self.next_flood_time = self.flood_rng.randint(cfg.FLOOD_MIN_INTERVAL, cfg.FLOOD_MAX_INTERVAL)
         self.flood_timer = 0
-        self.flood_clear_timer = 0
+        self.flood_clear_time = 0.0
+        self.flood_clear_event = None
         self.flood_pollution_total = 0
         self.river_risk_factor = 1.0
+        self.river_buildings = 0   # Bâtiments bordant la rivière (tenu à jour à chaque construction/destruction)
         self.message = "Bienvenue."
         self.message_color = cfg.COLORS["text"]
-        self.map_data = self._generate_map()
-        self.buildings_grid = [[None for _ in range(cfg.MAP_WIDTH)] for _ in range(cfg.MAP_HEIGHT)]
+        self.terrain_grid = self._generate_map()                                          # TERRAIN_IDS
+        self.terrain = TerrainAnalysis.from_ids(self.terrain_grid)
+        self.building_grid = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), dtype=np.uint8)     # IDs de self.rules (0 = vide)
         self.tile_resources = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), dtype=float)
         self.building_timestamps = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), dtype=float)
+        self.spread_active = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), dtype=bool)   # pollutionSpreadAfterSec écoulé
+        self.river_active = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), dtype=bool)    # pollutesRiverAfterSec écoulé
         self.pol_build_grid = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), dtype=float)
         self.pol_duration_grid = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), dtype=float)
         self.virt_build_grid = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), dtype=float)
@@ -194,12 +269,28 @@ class Game:
         self._init_tile_resources()
 
     def _generate_map(self):
-        game_map = np.full((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), "void", dtype=object)
-        game_map[MapTemplates.plain == 1] = "plain"
-        game_map[MapTemplates.forest == 1] = "forest"
-        game_map[MapTemplates.mountain == 1] = "mountain"
-        game_map[MapTemplates.river == 1] = "river"
+        game_map = np.full((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), TERRAIN_IDS["void"], dtype=np.uint8)
+        game_map[MapTemplates.plain == 1] = TERRAIN_IDS["plain"]
+        game_map[MapTemplates.forest == 1] = TERRAIN_IDS["forest"]
+        game_map[MapTemplates.mountain == 1] = TERRAIN_IDS["mountain"]
+        game_map[MapTemplates.river == 1] = TERRAIN_IDS["river"]
         return game_map
+
+    # --- ACCÈS AUX GRILLES ---
+
+    def _building_at(self, x, y):
+        """Nom du bâtiment en (x, y), ou None si la case est vide."""
+        b_id = self.building_grid[y, x]
+        return self.rules.names[b_id] if b_id else None
+
+    def _terrain_at(self, x, y):
+        return TERRAINS[self.terrain_grid[y, x]]
+
+    def _set_terrain(self, x, y, terrain):
+        """Change le terrain d'une case et recalcule les masques statiques."""
+        self.terrain_grid[y, x] = TERRAIN_IDS[terrain]
+        self.terrain.rebuild_from_ids(self.terrain_grid)
+        self._recount_river_buildings()
     
     def _get_ar_map_string(self):
         """
@@ -222,21 +313,54 @@ class Game:
 
     def _init_tile_resources(self):
         terrain_values = {}
-        for b_key, rules in BUILDING_RULES.items():
+        for b_key, rules in self.rules.buildings.items():
             prod = rules.get("production", {})
             yield_map = prod.get("tile_yield", {})
             for terrain_type, amount in yield_map.items():
                 terrain_values[terrain_type] = float(amount)
-        for y in range(cfg.MAP_HEIGHT):
-            for x in range(cfg.MAP_WIDTH):
-                terrain = self.map_data[y][x]
-                if terrain in terrain_values:
-                    self.tile_resources[y][x] = terrain_values[terrain]
+        for terrain, amount in terrain_values.items():
+            if terrain in TERRAIN_IDS:
+                self.tile_resources[self.terrain_grid == TERRAIN_IDS[terrain]] = amount
 
     # --- LOGIQUE ---
 
+    def advance(self, frame_dt):
+        """
+        Ajoute le temps réel écoulé à l'accumulateur et joue autant de pas fixes SIM_DT
+        que nécessaire (au plus SIM_MAX_STEPS_PER_FRAME). Au-delà, le retard est abandonné
+        pour ne pas s'enliser : la partie ralentit au lieu de diverger.
+        Retourne le nombre de pas simulés.
+        """
+        self.sim_accumulator += frame_dt
+        steps = 0
+        while self.sim_accumulator >= cfg.SIM_DT and steps < cfg.SIM_MAX_STEPS_PER_FRAME:
+            self.update_game_logic(cfg.SIM_DT)
+            self.sim_accumulator -= cfg.SIM_DT
+            steps += 1
+        if steps == cfg.SIM_MAX_STEPS_PER_FRAME and self.sim_accumulator >= cfg.SIM_DT:
+            self.sim_accumulator %= cfg.SIM_DT
+        self._flush_outbox()
+        return steps
+
+    def fast_forward(self, seconds=None):
+        """
+        Joue `seconds` secondes de simulation (le reste de la partie si None) aussi vite
+        que possible, sans rendu, avec les règles réelles du moteur.
+        Retourne la durée réelle écoulée (secondes).
+        """
+        start = time.perf_counter()
+        steps = round(seconds / cfg.SIM_DT) if seconds is not None else None
+        while not self.game_over and (steps is None or steps > 0):
+            if isinstance(self.clock, VirtualClock):
+                self.clock.advance(cfg.SIM_DT * 1000)
+            self.update_game_logic(cfg.SIM_DT)
+            self._flush_outbox()
+            if steps is not None: steps -= 1
+        return time.perf_counter() - start
+
     def update_game_logic(self, dt_seconds):
         if dt_seconds == 0: return
+        self.sim_time += dt_seconds
 
         self._process_network_commands()
 
@@ -245,18 +369,21 @@ class Game:
             if self.time_left <= 0:
                 self._end_game()
         if self.game_over: return
-        now_ms = pygame.time.get_ticks()
+        now_ms = self.sim_time * 1000.0
+        self.timers.run_due(self.sim_time)
         self._handle_flood_timers(dt_seconds)
-        if now_ms - self.last_action_check_time > (cfg.ACTION_FILE_CHECK_INTERVAL * 1000):
+        if self.file_bridge and now_ms - self.last_action_check_time > (cfg.ACTION_FILE_CHECK_INTERVAL * 1000):
             self._check_external_actions()
             self.last_action_check_time = now_ms
-        if now_ms - self.last_matrix_save_time > (cfg.MATRIX_SAVE_INTERVAL * 1000):
+        if self.file_bridge and now_ms - self.last_matrix_save_time > (cfg.MATRIX_SAVE_INTERVAL * 1000):
             self.save_matrix_snapshot()
             self.last_matrix_save_time = now_ms
-        if now_ms - self.last_production_time > 1000:
+        # Production : un cycle par seconde de simulation
+        self.production_timer += dt_seconds
+        while self.production_timer >= 1.0:
             self._process_production_cycle()
-            self.last_production_time = now_ms
-        self._process_continuous_effects(dt_seconds, now_ms)
+            self.production_timer -= 1.0
+        self._process_continuous_effects(dt_seconds)
 
     def _end_game(self):
         self.time_left = 0
@@ -295,37 +422,87 @@ class Game:
 
     def _handle_flood_timers(self, dt):
         if self.floods_occurred < self.max_floods_game:
-            self.river_risk_factor = self._calculate_risk_factor()
             self.flood_timer += dt * self.river_risk_factor
             if self.flood_timer >= self.next_flood_time:
                 self.trigger_flood()
                 self.flood_timer = 0
-                self.next_flood_time = random.randint(cfg.FLOOD_MIN_INTERVAL, cfg.FLOOD_MAX_INTERVAL)
-        if self.flood_clear_timer > 0:
-            self.flood_clear_timer -= dt
-            if self.flood_clear_timer <= 0:
-                # L'eau se retire
-                self.flooded_grid.fill(False) 
-                self.message = "L'eau se retire. La terre sèche."
-                
-                # --- AJOUT : ENVOYER LA CARTE PROPRE ---
-                if self.mobile_address:
-                    print(f"[RESEAU] Fin inondation -> Mise à jour Mobile")
-                    self._send_map_to_mobile(self.mobile_address)
+                self.next_flood_time = self.flood_rng.randint(cfg.FLOOD_MIN_INTERVAL, cfg.FLOOD_MAX_INTERVAL)
+
+    def _end_flood(self):
+        # L'eau se retire (minuterie programmée par trigger_flood)
+        self.flood_clear_event = None
+        self.flooded_grid.fill(False)
+        self.message = "L'eau se retire. La terre sèche."
+
+        # --- AJOUT : ENVOYER LA CARTE PROPRE ---
+        if self.mobile_address:
+            print(f"[RESEAU] Fin inondation -> Mise à jour Mobile")
+            self._send_map_to_mobile(self.mobile_address)
+
+    # --- MINUTERIES ---
+
+    def _schedule_building_timers(self, x, y):
+        """Programme l'activation différée (propagation, pollution de la rivière) du bâtiment en (x, y)."""
+        self._cancel_building_timers(x, y)
+        b_id = self.building_grid[y, x]
+        built_at = self.building_timestamps[y, x]
+        delayed = ((self.spread_active, self.rules.spreads_pollution[b_id], self.rules.spread_after_sec[b_id]),
+                   (self.river_active, self.rules.river_pollution[b_id] > 0, self.rules.river_after_sec[b_id]))
+        handles = []
+        for active, enabled, delay in delayed:
+            if not enabled: continue
+            if delay <= 0 or self.sim_time >= built_at + delay:
+                active[y, x] = True
+            else:
+                handles.append(self.timers.schedule(built_at + delay, self._activate_cell, active, x, y))
+        if handles: self.cell_timers[(x, y)] = handles
+
+    def _cancel_building_timers(self, x, y):
+        for handle in self.cell_timers.pop((x, y), ()):
+            self.timers.cancel(handle)
+        self.spread_active[y, x] = False
+        self.river_active[y, x] = False
+
+    @staticmethod
+    def _activate_cell(active, x, y):
+        active[y, x] = True
+
+    def _reschedule_building_timers(self):
+        """Après un rechargement des règles : délais recalculés depuis la date de construction."""
+        ys, xs = np.nonzero(self.building_grid)
+        for y, x in zip(ys.tolist(), xs.tolist()):
+            self._schedule_building_timers(x, y)
+
+    def _show_ai_suggestion(self, suggestion):
+        """Affiche une suggestion IA pendant AI_SUGGESTION_DURATION (temps d'horloge)."""
+        self.ai_suggestion = suggestion
+        self.ui_timers.cancel(self.ai_suggestion_event)
+        expires_at = self.clock.get_ticks() + cfg.AI_SUGGESTION_DURATION * 1000
+        self.ai_suggestion_event = self.ui_timers.schedule(expires_at, self._expire_ai_suggestion)
+
+    def _expire_ai_suggestion(self):
+        self.ai_suggestion_event = None
+        if self.ai_suggestion:
+            self.ai_suggestion = None
+            self.message = "IA : En attente..."
 
     def _calculate_risk_factor(self):
-        count = 0
-        for y in range(cfg.MAP_HEIGHT):
-            for x in range(cfg.MAP_WIDTH):
-                if self.buildings_grid[y][x]:
-                    if self.check_adjacency(x, y, "river", is_terrain=True):
-                        count += 1
-        return 1.0 + (count * 0.15)
+        return 1.0 + (self.river_buildings * 0.15)
+
+    def _on_building_changed(self, x, y, delta):
+        """Construction (+1) ou destruction (-1) en (x, y) : met à jour le risque de crue."""
+        if self.terrain.adjacent["river"][y, x]:
+            self.river_buildings += delta
+            self.river_risk_factor = self._calculate_risk_factor()
+
+    def _recount_river_buildings(self):
+        """Recomptage complet (changement de terrain uniquement)."""
+        self.river_buildings = int(np.count_nonzero((self.building_grid != 0) & self.terrain.adjacent["river"]))
+        self.river_risk_factor = self._calculate_risk_factor()
 
     def _get_ai_advice_text(self):
         # On force le dessin pour que le joueur voie le message
-            self.draw()
-            pygame.display.flip()
+            self._present()
             
             # APPEL DE L'IA ENTRAÎNÉE
             suggestion = self._consult_deep_learning()
@@ -333,16 +510,15 @@ class Game:
             if suggestion:
                 val, b_key, sx, sy = suggestion
                 
-                self.ai_suggestion = {
+                self._show_ai_suggestion({
                     'x': sx, 
                     'y': sy, 
                     'building': b_key, 
                     'action': val
-                }
-                self.ai_suggestion_end_time = pygame.time.get_ticks() + (cfg.AI_SUGGESTION_DURATION * 1000)
+                })
                 
                 type_act = "CONSTRUIRE" if val > 0 else "DÉTRUIRE"
-                nom_bat = BUILDING_RULES[b_key]['name']
+                nom_bat = self.rules.buildings[b_key]['name']
                 self.message = f"IA Suggère : {type_act} {nom_bat}"
                 self.message_color = (0, 255, 255) if val > 0 else (255, 100, 100)
             else:
@@ -372,11 +548,35 @@ class Game:
                     self.network.send_to(map_str, target_addr)
                     continue 
 
-                if message == "READY":
-                    print(f"[JEU] Mobile connecté depuis {addr}")
+                if message.split(",")[0] == "READY":
+                    # READY : grille complète à chaque envoi / READY,DELTA : flux versionné (state_stream.py)
+                    # ,BINARY : mêmes messages au format binaire compact (wire.py), ressources incluses
+                    options = message.split(",")[1:]
+                    print(f"[JEU] Mobile connecté depuis {addr} {options if options else ''}")
                     self.mobile_address = addr
+                    if "DELTA" in options or "BINARY" in options:
+                        self.state_streams[addr] = StateStream(cfg.STATE_KEYFRAME_INTERVAL,
+                                                               binary="BINARY" in options, delta="DELTA" in options)
+                    else: self.state_streams.pop(addr, None)
                     self._send_map_to_mobile(addr)
 
+                if message == "KEYFRAME":
+                    # Le client a détecté un paquet perdu : il redemande la grille complète
+                    stream = self.state_streams.get(addr)
+                    if stream:
+                        stream.request_keyframe()
+                        self._send_map_to_mobile(addr)
+
+                if message == "RESTART":
+                    # Nouvelle partie depuis le mobile (équivalent du bouton Rejouer), une fois la partie finie
+                    if self.game_over:
+                        print(f"[JEU] Nouvelle partie demandée par {addr}")
+                        self.reset_game()
+                        self.network.send_to("RESULT,OK", addr)
+                        self._send_map_to_mobile(addr)
+                    else:
+                        self.network.send_to("RESULT,ERROR", addr)
+
                 if message.startswith("BUILD"):
                     # Format : BUILD,index,typeID
                     parts = message.split(",")
@@ -418,22 +618,24 @@ class Game:
                         if 0 <= py_col < cfg.MAP_WIDTH and 0 <= py_row < cfg.MAP_HEIGHT:
                             
                             # On récupère le bâtiment à cet endroit précis
-                            b_name = self.buildings_grid[py_row][py_col]
+                            b_name = self._building_at(py_col, py_row)
                             
                             if b_name:
                                 print(f"[SUCCÈS] Destruction de {b_name} en ({py_col}, {py_row})")
                                 
                                 # Suppression
-                                self.buildings_grid[py_row][py_col] = None
+                                self.building_grid[py_row, py_col] = 0
+                                self._cancel_building_timers(py_col, py_row)
+                                self._on_building_changed(py_col, py_row, -1)
                                 
                                 # (Optionnel) Nettoyage pollution locale du bâtiment
                                 self.pol_build_grid[py_row][py_col] = 0
                                 
                                 # (Optionnel) Si le sol n'est pas spécial (rivière/montagne), on remet de la plaine
                                 # pour effacer la trace visuelle du bâtiment
-                                current_terrain = self.map_data[py_row][py_col]
-                                if current_terrain not in ["river", "mountain", "forest"]:
-                                     self.map_data[py_row][py_col] = "plain"
+                                current_terrain = self._terrain_at(py_col, py_row)
+                                if current_terrain not in ["river", "mountain", "forest", "plain"]:
+                                     self._set_terrain(py_col, py_row, "plain")
 
                                 # Mise à jour immédiate du mobile
                                 self._send_map_to_mobile(addr)
@@ -453,25 +655,29 @@ class Game:
             pass
 
     def _process_production_cycle(self):
-        for y in range(cfg.MAP_HEIGHT):
-            for x in range(cfg.MAP_WIDTH):
-                b_name = self.buildings_grid[y][x]
-                if not b_name or self.flooded_grid[y][x]: continue
-                rules = BUILDING_RULES[b_name]
-                prod = rules.get("production")
-                if prod and prod["amount"] > 0 and prod["resource"]:
-                    needed_terrain = rules.get("needs_adj_terrain")
-                    if needed_terrain:
-                        self._extract_resource_from_neighbors(x, y, prod, needed_terrain)
-                    else:
-                        self.resources[prod["resource"]] += prod["amount"]
+        active = (self.building_grid != 0) & ~self.flooded_grid
+        extracts = self.rules.operates_adj.any(axis=1)
+
+        # Production directe : somme des taux par ID sur les cases actives
+        direct = self.building_grid[active & ~extracts[self.building_grid]]
+        if direct.size:
+            self.resources["wood"] += float(self.rules.wood_rate[direct].sum())
+            self.resources["stones"] += float(self.rules.stone_rate[direct].sum())
+
+        # Extraction : séquentielle (ordre ligne par ligne), les tuiles voisines s'épuisent
+        ys, xs = np.nonzero(active & extracts[self.building_grid])
+        for y, x in zip(ys.tolist(), xs.tolist()):
+            rules = self.rules.buildings[self._building_at(x, y)]
+            prod = rules.get("production")
+            if prod and prod["amount"] > 0 and prod["resource"]:
+                self._extract_resource_from_neighbors(x, y, prod, rules["needs_adj_terrain"])
 
     def _extract_resource_from_neighbors(self, x, y, prod, needed_terrain):
         deltas = [(-1, 0), (1, 0), (0, -1), (0, 1)]
         for dx, dy in deltas:
             nx, ny = x + dx, y + dy
             if 0 <= nx < cfg.MAP_WIDTH and 0 <= ny < cfg.MAP_HEIGHT:
-                if self.map_data[ny][nx] in needed_terrain:
+                if self._terrain_at(nx, ny) in needed_terrain:
                     if self.tile_resources[ny][nx] > 0:
                         amount = prod["amount"]
                         self.tile_resources[ny][nx] -= amount
@@ -481,7 +687,7 @@ class Game:
                         return
 
     def _destroy_terrain_resource(self, x, y):
-        if self.map_data[y][x] == "forest":
+        if self.terrain_grid[y, x] == TERRAIN_IDS["forest"]:
             self.forests_destroyed_count += 1
             count = self.forests_destroyed_count
             loss_pct = 0.01 if count <= 10 else 0.02 if count <= 15 else 0.05 if count <= 25 else 0.10 if count <= 30 else 0.20
@@ -491,78 +697,94 @@ class Game:
             self.message_color = (255, 50, 50)
             
         self.tile_resources[y][x] = 0
-        self.map_data[y][x] = "plain"  # <--- C'est ici que la forêt disparait visuellement
+        self._set_terrain(x, y, "plain")  # <--- C'est ici que la forêt disparait visuellement
 
         # --- AJOUT À FAIRE ICI ---
         # On prévient le mobile immédiatement que le terrain a changé
         if self.mobile_address:
-            # On utilise send_to directement pour éviter d'attendre
             self._send_map_to_mobile(self.mobile_address)
         # -------------------------
 
-    def _process_continuous_effects(self, dt, now_ms):
-        for y in range(cfg.MAP_HEIGHT):
-            for x in range(cfg.MAP_WIDTH):
-                b_name = self.buildings_grid[y][x]
-                if not b_name: continue
-                rules = BUILDING_RULES[b_name]
-                is_working = True
-                if b_name in ["sawmill", "quarry"]:
-                    needed = rules.get("needs_adj_terrain")
-                    if needed and not self._has_adjacent_resource(x, y, needed):
-                        is_working = False
-                if not is_working: continue
-                virt_gain = rules.get("virtuosity_per_sec", 0) * dt
-                if virt_gain > 0:
-                    self.resources["virtuosity"] += virt_gain
-                    self.virt_duration_grid[y][x] += virt_gain
-                emission = rules.get("emits_per_sec", 0) * dt
-                if emission > 0:
-                    self.pol_duration_grid[y][x] += emission
-                    self._spread_pollution(x, y, rules, emission, now_ms)
-                self._process_river_pollution(x, y, rules, dt, now_ms)
-
-    def _has_adjacent_resource(self, x, y, terrain_list):
-        deltas = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        for dx, dy in deltas:
-            nx, ny = x + dx, y + dy
-            if 0 <= nx < cfg.MAP_WIDTH and 0 <= ny < cfg.MAP_HEIGHT:
-                if self.map_data[ny][nx] in terrain_list and self.tile_resources[ny][nx] > 0:
-                    return True
-        return False
-
-    def _spread_pollution(self, x, y, rules, emission, now_ms):
-        age = (now_ms / 1000.0) - self.building_timestamps[y][x]
-        spread_delay = rules.get("pollution_spread_after_sec", 0)
-        if rules.get("spreads_pollution") and age >= spread_delay:
-            deltas = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-            for dx, dy in deltas:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < cfg.MAP_WIDTH and 0 <= ny < cfg.MAP_HEIGHT:
-                    neighbor = self.buildings_grid[ny][nx]
-                    mod = ADJACENT_MODIFIERS.get(neighbor, 1.0) if neighbor else 1.0
-                    self.pol_duration_grid[ny][nx] += (emission * 0.5) * mod
-
-    def _process_river_pollution(self, x, y, rules, dt, now_ms):
-        target_amount = rules.get("river_pollution_amount", 0)
-        if target_amount <= 0: return
-        if self.check_adjacency(x, y, "river", is_terrain=True):
-            delay = rules.get("pollutes_river_after_sec", 0)
-            age = (now_ms / 1000.0) - self.building_timestamps[y][x]
-            if delay > 0 and age < delay: return
-            deltas = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-            fill_rate = target_amount / max(1, delay) if delay > 0 else target_amount
-            for dx, dy in deltas:
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < cfg.MAP_WIDTH and 0 <= ny < cfg.MAP_HEIGHT:
-                    if self.map_data[ny][nx] == "river":
-                        if delay > 0:
-                            current_val = self.pol_duration_grid[ny][nx]
-                            if current_val < target_amount:
-                                addition = fill_rate * dt
-                                self.pol_duration_grid[ny][nx] = min(target_amount, current_val + addition)
-                        else:
-                            self.pol_duration_grid[ny][nx] += target_amount * dt
+    def _process_continuous_effects(self, dt):
+        """
+        Effets continus de tous les bâtiments en une passe matricielle :
+        virtuosité, pollution propre, propagation aux voisins, pollution de la rivière.
+        """
+        ids = np.where(self._working_mask(), self.building_grid, 0)
+
+        # Virtuosité et pollution propre (taux par ID -> grilles de taux)
+        virt_gain = self.rules.virt_rate[ids] * dt
+        self.resources["virtuosity"] += float(virt_gain.sum())
+        self.virt_duration_grid += virt_gain
+        emission = self.rules.poll_rate[ids] * dt
+        self.pol_duration_grid += emission
+
+        # Propagation dans le rayon de diffusion une fois le délai écoulé (spread_active),
+        # pondérée par le bâtiment qui la reçoit
+        spreading = np.where(self.spread_active & (ids != 0), emission, 0.0)
+        received = self.diffusion.apply(spreading) * self.rules.adjacent_modifier[self.building_grid]
+
+        # Ajoutée avec la pollution de la rivière, qui en dépend sur les cases plafonnées
+        self._process_river_pollution(ids, dt, spreading, received)
+
+    def _working_mask(self):
+        """Cases bâties en activité : les extracteurs doivent toucher leur ressource."""
+        working = self.building_grid != 0
+        for b_id in np.flatnonzero(self.rules.operates_adj.any(axis=1)):
+            needed = self.rules.buildings[self.rules.names[b_id]]["needs_adj_terrain"]
+            # Une case épuisée redevient "plain" (_destroy_terrain_resource) : l'adjacence suffit
+            working &= (self.building_grid != b_id) | self.terrain.adjacent_to(needed)
+        return working
+
+    def _process_river_pollution(self, ids, dt, spreading, received):
+        """
+        Ajoute la propagation `received` (émissions sources : `spreading`) et la pollution de la rivière
+        par les bâtiments actifs qui la bordent. Un bâtiment à délai remplit ses cases de rivière jusqu'à
+        sa propre cible et n'ajoute rien si la case l'a déjà atteinte : sur ces cases plafonnées, le
+        résultat dépend de l'ordre, donc propagation de chaque source, pollution immédiate et remplissages
+        sont rejoués bâtiment par bâtiment dans l'ordre de la grille (ligne par ligne), comme la boucle
+        d'origine. Partout ailleurs, tout est additif : une seule passe matricielle.
+        """
+        pol = self.pol_duration_grid
+        target = self.rules.river_pollution[ids]
+        polluting = (target > 0) & self.terrain.adjacent["river"] & self.river_active
+        if not polluting.any():
+            pol += received
+            return
+        delay = self.rules.river_after_sec[ids]
+        river = self.terrain.masks["river"]
+        H, W = river.shape
+
+        # Case de rivière -> [(ordre, cible, délai)] des bâtiments de berge qui la polluent
+        hits = {}
+        for y, x in zip(*np.nonzero(polluting)):
+            for ny, nx in ((y, x - 1), (y, x + 1), (y - 1, x), (y + 1, x)):
+                if 0 <= ny < H and 0 <= nx < W and river[ny, nx]:
+                    hits.setdefault((ny, nx), []).append((y * W + x, float(target[y, x]), float(delay[y, x])))
+        capped = np.zeros_like(river)
+        for cell, polluters in hits.items():
+            if any(wait > 0 for _, _, wait in polluters): capped[cell] = True
+        pol += np.where(capped, 0.0, received)
+
+        for (ny, nx), polluters in hits.items():
+            if not capped[ny, nx]:
+                # Sans délai : pollution immédiate, non plafonnée
+                for _, amount, _ in polluters: pol[ny, nx] += amount * dt
+                continue
+            # Pour un même bâtiment, la propagation passe avant la rivière (phase 0 puis 1)
+            mod = self.rules.adjacent_modifier[self.building_grid[ny, nx]]
+            events = [(order, 0, amount * mod, 0.0) for order, amount in self.diffusion.sources(spreading, ny, nx)]
+            events += [(order, 1, amount, wait) for order, amount, wait in polluters]
+            value = pol[ny, nx]
+            for _, phase, amount, wait in sorted(events):
+                if phase == 0:
+                    value += amount
+                elif wait > 0:
+                    # Avec délai : remplissage progressif, plafonné à la cible de ce bâtiment
+                    if value < amount: value = min(amount, value + amount / max(1, wait) * dt)
+                else:
+                    value += amount * dt
+            pol[ny, nx] = value
 
     # --- ACTIONS ---
 
@@ -574,14 +796,14 @@ class Game:
 
         # Logique de destruction (inchangée)
         if self.selected_building == "demolish":
-            if self.buildings_grid[y][x]:
-                self.execute_action(x, y, self.buildings_grid[y][x], -1, is_flood=False)
+            if self.building_grid[y, x]:
+                self.execute_action(x, y, self._building_at(x, y), -1, is_flood=False)
             else:
                 self.message = "Rien à détruire ici."
             return
 
         # Vérification si la case est occupée (inchangée)
-        if self.buildings_grid[y][x]:
+        if self.building_grid[y, x]:
             self.trigger_popup("error", "IMPOSSIBLE", "Cet emplacement est déjà occupé.")
             return
 
@@ -591,7 +813,7 @@ class Game:
             return
 
         # Vérification des règles de construction (voisins, terrain interdit...)
-        rules = BUILDING_RULES.get(self.selected_building)
+        rules = self.rules.buildings.get(self.selected_building)
         if not self._check_building_constraints(x, y, rules): return
 
         # Vérification du coût en ressources
@@ -603,7 +825,7 @@ class Game:
         self.execute_action(x, y, self.selected_building, 1)
 
     def _check_building_constraints(self, x, y, rules):
-        terrain = self.map_data[y][x]
+        terrain = self._terrain_at(x, y)
         if terrain in rules.get("forbidden", []):
             self.trigger_popup("error", "EMPLACEMENT INVALIDE", f"Interdit sur : {terrain}.")
             return False
@@ -635,21 +857,23 @@ class Game:
         if self.game_over: return
         if action_type == 0: return
         if action_type == -1:
-            current_b = self.buildings_grid[y][x]
+            current_b = self._building_at(x, y)
             if current_b and (current_b == b_key or b_key == "ANY"):
                 if not is_flood:
-                    b_rules = BUILDING_RULES[current_b]
+                    b_rules = self.rules.buildings[current_b]
                     virt_lost = b_rules.get("virtuosity_loss_on_destroy", 0)
                     self.resources["virtuosity"] = max(0, self.resources["virtuosity"] - virt_lost)
                     self.virt_build_grid[y][x] = 0
                     self.message = f"Détruit ! -{virt_lost} Virtuosité (Pollution persistante)."
                     self.message_color = (255, 100, 100)
-                self.buildings_grid[y][x] = None
+                self.building_grid[y, x] = 0
+                self._cancel_building_timers(x, y)
+                self._on_building_changed(x, y, -1)
                 self.building_counts[current_b] -= 1
                 self.destroyed_counts[current_b] += 1
             return
         if action_type == 1:
-            rules = BUILDING_RULES.get(b_key)
+            rules = self.rules.buildings.get(b_key)
             if not rules: return
             cost_wood = rules["cost"].get("wood", 0)
             cost_stones = rules["cost"].get("stones", 0)
@@ -661,9 +885,11 @@ class Game:
             if is_free: cost_wood, cost_stones = 0, 0
             self.resources["wood"] -= cost_wood
             self.resources["stones"] -= cost_stones
-            self.buildings_grid[y][x] = b_key
+            self.building_grid[y, x] = self.rules.ids[b_key]
+            self._on_building_changed(x, y, +1)
             self.building_counts[b_key] += 1
-            self.building_timestamps[y][x] = pygame.time.get_ticks() / 1000.0
+            self.building_timestamps[y][x] = self.sim_time
+            self._schedule_building_timers(x, y)
             self.pol_build_grid[y][x] += rules.get("pollution_on_build", 0)
             v_val = rules.get("virtuosity_on_build", 0)
             self.virt_build_grid[y][x] += v_val
@@ -673,48 +899,28 @@ class Game:
             self.message_color = (80, 255, 80)
 
     def trigger_flood(self):
-        candidates = set()
-        for y in range(cfg.MAP_HEIGHT):
-            for x in range(cfg.MAP_WIDTH):
-                if self.map_data[y][x] == "river":
-                    for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                        nx, ny = x + dx, y + dy
-                        if 0 <= nx < cfg.MAP_WIDTH and 0 <= ny < cfg.MAP_HEIGHT:
-                            if self.map_data[ny][nx] not in ["river", "void"]:
-                                candidates.add((nx, ny))
-        if not candidates: return
-        count = len(candidates)
-        target = random.randint(max(1, count // 3), max(2, int(count * 2 / 3)))
-        flooded_selection = set()
-        cand_list = list(candidates)
-        while len(flooded_selection) < target and cand_list:
-            start = random.choice(cand_list)
-            frontier = [start]
-            while frontier and len(flooded_selection) < target:
-                curr = frontier.pop(random.randint(0, len(frontier)-1))
-                if curr in flooded_selection: continue
-                flooded_selection.add(curr)
-                if curr in cand_list: cand_list.remove(curr)
-                cx, cy = curr
-                for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-                    neighbor = (cx + dx, cy + dy)
-                    if neighbor in candidates and neighbor not in flooded_selection and neighbor not in frontier:
-                        frontier.append(neighbor)
+        count = len(self.terrain.bank_cells)
+        if not count: return
+        target = self.flood_rng.randint(max(1, count // 3), max(2, int(count * 2 / 3)))
+        flooded = grow_flood(self.terrain.flood_candidates, target, self.flood_rng, self.terrain.bank_cells)
+        flooded_count = int(np.count_nonzero(flooded))
+        self.flooded_grid |= flooded
         destroyed = 0
         poll_increase = 0
-        for fx, fy in flooded_selection:
-            self.flooded_grid[fy][fx] = True
-            b_name = self.buildings_grid[fy][fx]
-            if b_name:
-                rules = BUILDING_RULES[b_name].get("on_flood", {})
-                poll_increase += rules.get("floodScoreIncrease", 0)
-                if rules.get("destroyed", False):
-                    self.execute_action(fx, fy, b_name, -1, is_flood=True)
-                    destroyed += 1
+        ys, xs = np.nonzero(flooded & (self.building_grid != 0))
+        for fy, fx in zip(ys.tolist(), xs.tolist()):
+            b_name = self._building_at(fx, fy)
+            rules = self.rules.buildings[b_name].get("on_flood", {})
+            poll_increase += rules.get("floodScoreIncrease", 0)
+            if rules.get("destroyed", False):
+                self.execute_action(fx, fy, b_name, -1, is_flood=True)
+                destroyed += 1
         self.flood_pollution_total += poll_increase
-        self.message = f"CRUE ! {len(flooded_selection)} zones inondées. {destroyed} détruits."
+        self.message = f"CRUE ! {flooded_count} zones inondées. {destroyed} détruits."
         self.message_color = (255, 100, 100)
-        self.flood_clear_timer = cfg.FLOOD_DURATION
+        self.timers.cancel(self.flood_clear_event)
+        self.flood_clear_time = self.sim_time + cfg.FLOOD_DURATION
+        self.flood_clear_event = self.timers.schedule(self.flood_clear_time, self._end_flood)
         self.floods_occurred += 1
 
         if self.mobile_address:
@@ -722,26 +928,26 @@ class Game:
             self._send_map_to_mobile(self.mobile_address)
             
             # Optionnel : Envoyer aussi un Popup d'alerte
-            msg = f"Attention !\n{len(flooded_selection)} zones touchées\n{destroyed} bâtiments détruits"
+            msg = f"Attention !\n{flooded_count} zones touchées\n{destroyed} bâtiments détruits"
             self.trigger_popup("ERROR", "INONDATION !", msg)
 
     def check_adjacency(self, x, y, target, is_terrain=True):
         targets = [target] if isinstance(target, str) else target
         if not targets: return False
+        if is_terrain: return bool(self.terrain.adjacent_to(targets)[y, x])
         for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
             nx, ny = x + dx, y + dy
             if 0 <= nx < cfg.MAP_WIDTH and 0 <= ny < cfg.MAP_HEIGHT:
-                val = self.map_data[ny][nx] if is_terrain else self.buildings_grid[ny][nx]
-                if val in targets: return True
+                if self._building_at(nx, ny) in targets: return True
         return False
 
     def _get_pollution_warning(self, x, y):
         for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
             nx, ny = x + dx, y + dy
             if 0 <= nx < cfg.MAP_WIDTH and 0 <= ny < cfg.MAP_HEIGHT:
-                neighbor = self.buildings_grid[ny][nx]
-                if neighbor and ADJACENT_MODIFIERS.get(neighbor, 1.0) > 1.0:
-                    return f"Zone à risque : {BUILDING_RULES[neighbor]['name']} (x{ADJACENT_MODIFIERS[neighbor]})"
+                neighbor = self._building_at(nx, ny)
+                if neighbor and self.rules.adjacent_modifiers.get(neighbor, 1.0) > 1.0:
+                    return f"Zone à risque : {self.rules.buildings[neighbor]['name']} (x{self.rules.adjacent_modifiers[neighbor]})"
         return None
 
     def trigger_popup(self, type_popup, title, message, action_data=None):
@@ -760,8 +966,9 @@ class Game:
         print(f"[DEBUG] Adresse mobile pour popup : {addr}")
 
         if addr:
-            print(f"[RESEAU] Envoi Popup vers {addr} : {packet}")
-            self.network.send_to(packet, addr)
+            # Envoyé au prochain flush, fusionné avec les autres popups de la frame (outbox.py)
+            print(f"[RESEAU] Popup pour {addr} : {packet}")
+            self.outbox.queue_popup(addr, type_popup.upper(), title, clean_message)
         else:
             print(f"[INFO] Popup (Pas de mobile connecté) : {title} - {message}")
 
@@ -786,7 +993,7 @@ class Game:
                 if not line: continue
                 if line.startswith("===") and line.endswith("==="):
                     b_name = line.replace("=", "").strip()
-                    if b_name in BUILDING_RULES:
+                    if b_name in self.rules.buildings:
                         curr_b, row = b_name, 0
                     continue
                 if curr_b and row < cfg.MAP_HEIGHT:
@@ -796,35 +1003,56 @@ class Game:
                             try:
                                 val = int(val_str)
                                 if val != 0:
-                                    self.ai_suggestion = {'x': col, 'y': row, 'building': curr_b, 'action': val}
-                                    self.ai_suggestion_end_time = pygame.time.get_ticks() + (cfg.AI_SUGGESTION_DURATION * 1000)
+                                    self._show_ai_suggestion({'x': col, 'y': row, 'building': curr_b, 'action': val})
                                     act_str = "construire" if val > 0 else "détruire"
-                                    self.message = f"IA Suggère : {act_str} {BUILDING_RULES[curr_b]['name']}"
+                                    self.message = f"IA Suggère : {act_str} {self.rules.buildings[curr_b]['name']}"
                                     self.message_color = (0, 255, 255) if val > 0 else (255, 100, 100)
                             except: pass
                         row += 1
         except Exception as e:
             print(f"Erreur lecture action.txt : {e}")
 
+    def _check_rules_reload(self):
+        """Recharge Rules.json à chaud s'il a changé sur disque. Appelé entre deux frames."""
+        try:
+            mtime = os.path.getmtime(self.rules.path)
+        except OSError:
+            return
+        if mtime == self.rules.mtime or mtime == self.rules_rejected_mtime: return
+
+        rules, errors, elapsed_ms = reload_rules(self.rules)
+        if errors:
+            # Fichier refusé : on garde les anciennes règles jusqu'à la prochaine modification
+            self.rules_rejected_mtime = mtime
+            print(f"[REGLES] Rules.json rejeté ({elapsed_ms:.1f} ms) : {' | '.join(errors)}")
+            self.message = "Rules.json invalide : anciennes règles conservées."
+            self.message_color = cfg.COLORS["error"]
+            return
+
+        self.rules = rules
+        self.rules_rejected_mtime = None
+        self.diffusion = self._build_diffusion()
+        self._reschedule_building_timers()
+        print(f"[REGLES] Rules.json rechargé en {elapsed_ms:.1f} ms")
+        self.message = f"Règles rechargées ({elapsed_ms:.1f} ms)."
+        self.message_color = cfg.COLORS["success"]
+
+    def _build_diffusion(self):
+        """Noyau de propagation de la pollution (rayon common.pollutionSpreadRadius)."""
+        return PollutionDiffusion.from_rules(self.rules, cfg.POLLUTION_SPREAD_SHARE, cfg.POLLUTION_SPREAD_FALLOFF)
+
     def save_matrix_snapshot(self):
         folder = "Batiment_Maps"
         if not os.path.exists(folder): os.makedirs(folder)
         filename = f"{folder}/matrix_state.txt"
         content = f"Snapshot Date: {datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}\n\n"
+        def layer(mask):
+            return "".join(" ".join(row) + "\n" for row in np.where(mask, "1", "0")) + "\n"
         for t in ['mountain', 'plain', 'forest', 'river']:
-            content += f"=== {t} ===\n"
-            for y in range(cfg.MAP_HEIGHT):
-                content += " ".join(["1" if self.map_data[y][x] == t else "0" for x in range(cfg.MAP_WIDTH)]) + "\n"
-            content += "\n"
-        content += f"=== FLOOD ===\n"
-        for y in range(cfg.MAP_HEIGHT):
-            content += " ".join(["1" if self.flooded_grid[y][x] else "0" for x in range(cfg.MAP_WIDTH)]) + "\n"
-        content += "\n"
+            content += f"=== {t} ===\n" + layer(self.terrain_grid == TERRAIN_IDS[t])
+        content += f"=== FLOOD ===\n" + layer(self.flooded_grid)
         for b in ['sawmill', 'quarry', 'coal_plant', 'wind_turbine', 'nuclear_plant', 'residence']:
-            content += f"=== {b} ===\n"
-            for y in range(cfg.MAP_HEIGHT):
-                content += " ".join(["1" if self.buildings_grid[y][x] == b else "0" for x in range(cfg.MAP_WIDTH)]) + "\n"
-            content += "\n"
+            content += f"=== {b} ===\n" + layer(self.building_grid == self.rules.ids[b])
         try:
             with open(filename, "w", encoding="utf-8") as f:
                 f.write(content)
@@ -833,7 +1061,8 @@ class Game:
     def save_game_results(self):
         folder = "Terrapolis_Save"
         if not os.path.exists(folder): os.makedirs(folder)
-        filename = f"{folder}/Save_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"
+        session = f"{self.session_id}_" if self.session_id else ""
+        filename = f"{folder}/Save_{session}{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.txt"
         content = f"=== RAPPORT DE FIN DE PARTIE - TERRAPOLIS ===\n"
         content += f"Date : {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}\n\n"
         content += f"SCORE FINAL : {self.final_stats['score']}\n"
@@ -845,7 +1074,7 @@ class Game:
         content += f"  > Inondation  : {self.final_stats['pol_flood']}\n\n"
         content += f"BÂTIMENTS (Construits / Détruits):\n"
         for k, v in self.building_counts.items():
-            content += f"- {BUILDING_RULES[k]['name']:<18} : {v} / {self.destroyed_counts[k]}\n"
+            content += f"- {self.rules.buildings[k]['name']:<18} : {v} / {self.destroyed_counts[k]}\n"
         try:
             with open(filename, "w", encoding="utf-8") as f: f.write(content)
             self.message = f"Sauvegardé : {os.path.basename(filename)}"
@@ -853,73 +1082,147 @@ class Game:
 
     # --- DRAWING ---
 
+    def _present(self):
+        """Dessine et affiche une frame (rien en mode headless) : seules les zones modifiées partent à l'écran."""
+        if self.headless: return
+        start = time.perf_counter()
+        rects = self.draw()
+        if rects is None: pygame.display.flip()
+        elif rects: pygame.display.update(rects)
+        self.frame_stats.add((time.perf_counter() - start) * 1000)
+
     def draw(self):
-        self.screen.fill(cfg.COLORS["ui_bg"])
-        
-        # 1. On dessine le marqueur AR sur la bande de gauche
-        self.screen.blit(self.qr_sidebar_surface, (0, 0))
-        
-        # 2. On dessine la carte (qui est décalée)
-        self._draw_map_area()
-        
-        # 3. L'interface
+        """
+        Compose la frame. Retourne les zones d'écran modifiées, ou None si tout l'écran
+        a été redessiné (première frame, popup ou fin de partie affichés ou refermés).
+        """
+        dirty = self._refresh_map_layer()
+        modal = self.game_over or self.popup_active
+        if self.full_redraw or modal or self.modal_was_active:
+            self.full_redraw = False
+            self.modal_was_active = modal
+            self.screen.fill(cfg.COLORS["ui_bg"])
+            
+            # 1. On dessine le marqueur AR sur la bande de gauche
+            self.screen.blit(self.qr_sidebar_surface, (0, 0))
+            
+            # 2. On dessine la carte (qui est décalée) depuis le calque en cache
+            self.screen.blit(self.map_layer, self.map_rect)
+            self.overlay_rects = self._draw_map_overlays()
+            
+            # 3. L'interface
+            self._draw_sidebar_ui()
+            self._draw_popups_and_overlays()
+            return None
+
+        # Frame partielle : tuiles modifiées, surimpressions (anciennes et nouvelles) et menu latéral
+        rects = [self._tile_rect(x, y).move(self.map_rect.topleft) for y, x in zip(*np.nonzero(dirty))]
+        for r in self.overlay_rects + rects:
+            self._restore_background(r)
+        current = self._draw_map_overlays()
+        self.screen.fill(cfg.COLORS["ui_bg"], self.sidebar_rect)
         self._draw_sidebar_ui()
-        self._draw_popups_and_overlays()
-
-    def _draw_map_area(self):
-        # On applique le décalage pour ne pas dessiner sur le marqueur AR
-        off_x = cfg.MAP_OFFSET_X
-        off_y = cfg.MAP_OFFSET_Y
-
-        for y in range(cfg.MAP_HEIGHT):
-            for x in range(cfg.MAP_WIDTH):
-                rect = pygame.Rect(off_x + x * cfg.TILE_SIZE, off_y + y * cfg.TILE_SIZE, cfg.TILE_SIZE, cfg.TILE_SIZE)
-                self._draw_tile_base(x, y, rect)
-                self._draw_tile_resources(x, y, rect)
-                if self.buildings_grid[y][x]:
-                    self._draw_building(x, y, rect, self.buildings_grid[y][x])
-        self._draw_selection_ghost()
-        self._draw_ai_suggestion()
-
-    def _draw_tile_base(self, x, y, rect):
-        if self.flooded_grid[y][x]:
-            color = cfg.COLORS["mud"]
-            if self.flood_clear_timer <= cfg.FLOOD_FADE_DURATION:
-                t = max(0.0, min(1.0, 1.0 - (self.flood_clear_timer / cfg.FLOOD_FADE_DURATION)))
-                base = cfg.COLORS.get(self.map_data[y][x], (0,0,0))
-                r = color[0] + (base[0] - color[0]) * t
-                g = color[1] + (base[1] - color[1]) * t
-                b = color[2] + (base[2] - color[2]) * t
-                color = (int(r), int(g), int(b))
-            pygame.draw.rect(self.screen, color, rect)
+        rects += self.overlay_rects + current + [self.sidebar_rect]
+        self.overlay_rects = current
+        return rects
+
+    def _report_frame_stats(self):
+        print(f"[RENDU] {self.frame_stats.report(self.text)}")
+        self.text.reset_stats()
+
+    def _restore_background(self, rect):
+        """Remet sous `rect` le fond de l'écran (bande AR, carte en cache, fond du menu)."""
+        part = rect.clip(self.map_rect)
+        if part: self.screen.blit(self.map_layer, part, part.move(-self.map_rect.x, -self.map_rect.y))
+        part = rect.clip(self.qr_rect)
+        if part: self.screen.blit(self.qr_sidebar_surface, part, part)
+        part = rect.clip(self.sidebar_rect)
+        if part: self.screen.fill(cfg.COLORS["ui_bg"], part)
+
+    @staticmethod
+    def _tile_rect(x, y):
+        """Rectangle d'une tuile dans les calques de la carte (sans le décalage écran)."""
+        return pygame.Rect(x * cfg.TILE_SIZE, y * cfg.TILE_SIZE, cfg.TILE_SIZE, cfg.TILE_SIZE)
+
+    def _tile_signature(self):
+        """État visible de chaque tuile : une tuile n'est redessinée que si sa signature change."""
+        fade = 0
+        remaining = self.flood_clear_time - self.sim_time
+        if remaining <= cfg.FLOOD_FADE_DURATION:
+            fade = int(max(0.0, min(1.0, 1.0 - (remaining / cfg.FLOOD_FADE_DURATION))) * 1000)
+        return np.stack([self.terrain_grid.astype(np.int64),
+                         self.building_grid.astype(np.int64),
+                         np.where(self.flooded_grid, 1 + fade, 0),
+                         self.tile_resources.astype(np.int64)])
+
+    def _refresh_map_layer(self):
+        """
+        Met à jour map_layer pour les seules tuiles modifiées (construction, destruction,
+        ressource extraite, inondation et son fondu). Retourne le masque de ces tuiles.
+        """
+        state = self._tile_signature()
+        if self.tile_state is None:
+            dirty = terrain_dirty = np.ones(state.shape[1:], dtype=bool)
         else:
-            pygame.draw.rect(self.screen, cfg.COLORS.get(self.map_data[y][x], (0,0,0)), rect)
-        pygame.draw.rect(self.screen, (30,30,30), rect, 1)
-
-    def _draw_tile_resources(self, x, y, rect):
-        if self.map_data[y][x] in ["forest", "mountain"] and not self.flooded_grid[y][x]:
+            changed = state != self.tile_state
+            dirty, terrain_dirty = changed.any(axis=0), changed[0]
+        self.tile_state = state
+        for y, x in zip(*np.nonzero(terrain_dirty)):
+            rect = self._tile_rect(x, y)
+            pygame.draw.rect(self.terrain_layer, cfg.COLORS.get(self._terrain_at(x, y), (0,0,0)), rect)
+            pygame.draw.rect(self.terrain_layer, (30,30,30), rect, 1)
+        for y, x in zip(*np.nonzero(dirty)):
+            rect = self._tile_rect(x, y)
+            if self.flooded_grid[y, x]:
+                self._draw_flooded_tile(self.map_layer, x, y, rect)
+            else:
+                self.map_layer.blit(self.terrain_layer, rect, rect)
+            self._draw_tile_resources(self.map_layer, x, y, rect)
+            if self.building_grid[y, x]:
+                self._draw_building(self.map_layer, x, y, rect, self._building_at(x, y))
+        return dirty
+
+    def _draw_map_overlays(self):
+        """Surimpressions redessinées à chaque frame. Retourne les zones d'écran couvertes."""
+        return [r for r in (self._draw_selection_ghost(), self._draw_ai_suggestion()) if r]
+
+    def _draw_flooded_tile(self, surface, x, y, rect):
+        color = cfg.COLORS["mud"]
+        remaining = self.flood_clear_time - self.sim_time
+        if remaining <= cfg.FLOOD_FADE_DURATION:
+            t = max(0.0, min(1.0, 1.0 - (remaining / cfg.FLOOD_FADE_DURATION)))
+            base = cfg.COLORS.get(self._terrain_at(x, y), (0,0,0))
+            r = color[0] + (base[0] - color[0]) * t
+            g = color[1] + (base[1] - color[1]) * t
+            b = color[2] + (base[2] - color[2]) * t
+            color = (int(r), int(g), int(b))
+        pygame.draw.rect(surface, color, rect)
+        pygame.draw.rect(surface, (30,30,30), rect, 1)
+
+    def _draw_tile_resources(self, surface, x, y, rect):
+        if self._terrain_at(x, y) in ["forest", "mountain"] and not self.flooded_grid[y][x]:
             qty = int(self.tile_resources[y][x])
             if qty > 0:
-                is_forest = self.map_data[y][x] == "forest"
+                is_forest = self.terrain_grid[y, x] == TERRAIN_IDS["forest"]
                 fg = (180, 255, 180) if is_forest else (220, 220, 220)
                 bg = (20, 60, 20) if is_forest else (40, 40, 40)
-                surf = self.score_font.render(str(qty), True, fg)
+                surf = self.text.render(self.score_font, str(qty), True, fg)
                 r_bg = surf.get_rect(topleft=(rect.left+5, rect.top+5)).inflate(8, 4)
-                pygame.draw.rect(self.screen, bg, r_bg, border_radius=4)
-                pygame.draw.rect(self.screen, (200,200,200), r_bg, 1, border_radius=4)
-                self.screen.blit(surf, r_bg.move(4, 2))
+                pygame.draw.rect(surface, bg, r_bg, border_radius=4)
+                pygame.draw.rect(surface, (200,200,200), r_bg, 1, border_radius=4)
+                surface.blit(surf, r_bg.move(4, 2))
 
-    def _draw_building(self, x, y, rect, b_key):
+    def _draw_building(self, surface, x, y, rect, b_key):
         b_rect = rect.inflate(-4, -4)
         sprite = self.building_sprites.get(b_key)
         if sprite:
-            self.screen.blit(sprite, rect)
-            pygame.draw.rect(self.screen, (0,0,0), b_rect, 1)
+            surface.blit(sprite, rect)
+            pygame.draw.rect(surface, (0,0,0), b_rect, 1)
         else:
-            pygame.draw.rect(self.screen, (100, 100, 100), b_rect)
-            pygame.draw.rect(self.screen, (0,0,0), b_rect, 2)
-            txt = self.icon_font.render("?", True, (255, 255, 255))
-            self.screen.blit(txt, txt.get_rect(center=rect.center))
+            pygame.draw.rect(surface, (100, 100, 100), b_rect)
+            pygame.draw.rect(surface, (0,0,0), b_rect, 2)
+            txt = self.text.render(self.icon_font, "?", True, (255, 255, 255))
+            surface.blit(txt, txt.get_rect(center=rect.center))
 
     def _draw_selection_ghost(self):
         if self.selected_building and self.selected_building != "demolish" and not self.popup_active:
@@ -937,11 +1240,11 @@ class Game:
                     self.screen.blit(ghost, r)
                 else:
                     pygame.draw.rect(self.screen, (255, 255, 255), r, 2)
+                return r
+        return None
 
     def _draw_ai_suggestion(self):
-        if not self.ai_suggestion: return
-        if pygame.time.get_ticks() >= self.ai_suggestion_end_time:
-            self.ai_suggestion = None; self.message = "IA : En attente..."; return
+        if not self.ai_suggestion: return None
         sx, sy = self.ai_suggestion['x'], self.ai_suggestion['y']
         b_key = self.ai_suggestion['building']
         action = self.ai_suggestion['action']
@@ -954,15 +1257,16 @@ class Game:
             ghost.set_alpha(180)
             self.screen.blit(ghost, rect)
         else:
-            txt = self.icon_font.render("?", True, col)
+            txt = self.text.render(self.icon_font, "?", True, col)
             self.screen.blit(txt, txt.get_rect(center=rect.center))
         pygame.draw.rect(self.screen, col, rect, 4)
-        txt = f"{'CONSEIL' if action > 0 else 'DÉTRUIRE'}: {BUILDING_RULES[b_key]['name']}"
-        lbl = self.tiny_font.render(txt, True, (255,255,255))
+        txt = f"{'CONSEIL' if action > 0 else 'DÉTRUIRE'}: {self.rules.buildings[b_key]['name']}"
+        lbl = self.text.render(self.tiny_font, txt, True, (255,255,255))
         r_lbl = lbl.get_rect(midbottom=(rect.centerx, rect.top-5)).inflate(8,4)
         pygame.draw.rect(self.screen, (0,0,0), r_lbl, border_radius=4)
         pygame.draw.rect(self.screen, col, r_lbl, 1, border_radius=4)
         self.screen.blit(lbl, lbl.get_rect(center=r_lbl.center))
+        return rect.union(r_lbl)
 
     def _draw_sidebar_ui(self):
         # Position du menu = Marge QR + Largeur Carte + Petite marge
@@ -970,18 +1274,18 @@ class Game:
         y = 10
         mins, secs = divmod(int(self.time_left), 60)
         col = (255, 50, 50) if self.time_left < 60 else (255, 255, 255)
-        self.screen.blit(self.timer_font.render(f"TEMPS RESTANT: {mins:02}:{secs:02}", True, col), (ui_x, y))
+        self.screen.blit(self.text.render(self.timer_font, f"TEMPS RESTANT: {mins:02}:{secs:02}", True, col), (ui_x, y))
         y += 30
         if self.floods_occurred < self.max_floods_game:
             f_in = int(self.next_flood_time - self.flood_timer)
             col_f = (100, 200, 255) if f_in > 10 else (255, 50, 50)
-            self.screen.blit(self.small_font.render(f"Prochaine crue : {f_in}s", True, col_f), (ui_x, y))
+            self.screen.blit(self.text.render(self.small_font, f"Prochaine crue : {f_in}s", True, col_f), (ui_x, y))
             risk = self.river_risk_factor
             col_r = (100, 255, 100) if risk <= 1.5 else (255, 165, 0) if risk <= 2.0 else (255, 50, 50)
-            self.screen.blit(self.small_font.render(f"Risque Crue : x{risk:.1f}", True, col_r), (ui_x, y+15))
+            self.screen.blit(self.text.render(self.small_font, f"Risque Crue : x{risk:.1f}", True, col_r), (ui_x, y+15))
             y += 35
         else:
-            self.screen.blit(self.small_font.render("Aucune crue prévue", True, (100, 255, 100)), (ui_x, y))
+            self.screen.blit(self.text.render(self.small_font, "Aucune crue prévue", True, (100, 255, 100)), (ui_x, y))
             y += 20
         lbls = [
             (f"POL CONSTR: {int(np.sum(self.pol_build_grid))}", (255, 200, 50)),
@@ -989,7 +1293,7 @@ class Game:
             (f"POL CRUE:   {int(self.flood_pollution_total)}", (200, 100, 255))
         ]
         for txt, c in lbls:
-            self.screen.blit(self.font.render(txt, True, c), (ui_x, y))
+            self.screen.blit(self.text.render(self.font, txt, True, c), (ui_x, y))
             y += 20
         y += 10
         noms_fr = {
@@ -1000,7 +1304,7 @@ class Game:
         for r, v in self.resources.items():
             c = (100, 255, 200) if r == "virtuosity" else cfg.COLORS["text"]
             nom_affiche = noms_fr.get(r, r.capitalize())
-            self.screen.blit(self.font.render(f"{nom_affiche}: {int(v)}", True, c), (ui_x, y))
+            self.screen.blit(self.text.render(self.font, f"{nom_affiche}: {int(v)}", True, c), (ui_x, y))
             y += 20
         y += 10
         pygame.draw.line(self.screen, (100,100,100), (ui_x, y), (cfg.SCREEN_WIDTH-10, y), 1)
@@ -1010,7 +1314,7 @@ class Game:
         bg_ai = (50, 100, 150) if self.ai_btn_rect.collidepoint(m_pos) else (40, 80, 120)
         pygame.draw.rect(self.screen, bg_ai, self.ai_btn_rect, border_radius=6)
         pygame.draw.rect(self.screen, (100, 200, 255), self.ai_btn_rect, 2, border_radius=6)
-        t_ai = self.font.render("IA : CONSEILLER", True, (255, 255, 255))
+        t_ai = self.text.render(self.font, "IA : CONSEILLER", True, (255, 255, 255))
         self.screen.blit(t_ai, t_ai.get_rect(center=self.ai_btn_rect.center))
         y += 45
         demolish_rect = pygame.Rect(ui_x, y, cfg.SIDEBAR_WIDTH-20, 40)
@@ -1018,15 +1322,15 @@ class Game:
         bg_dem = (100, 40, 40) if is_dem else (70, 40, 40) if demolish_rect.collidepoint(m_pos) else (50, 30, 30)
         pygame.draw.rect(self.screen, bg_dem, demolish_rect)
         if is_dem: pygame.draw.rect(self.screen, (255, 80, 80), demolish_rect, 2)
-        self.screen.blit(self.font.render("DÉMOLIR", True, (255, 100, 100)), (ui_x + 40, y + 10))
-        try: self.screen.blit(self.icon_font.render("💣", True, (255, 100, 100)), (ui_x + 5, y - 2))
+        self.screen.blit(self.text.render(self.font, "DÉMOLIR", True, (255, 100, 100)), (ui_x + 40, y + 10))
+        try: self.screen.blit(self.text.render(self.icon_font, "💣", True, (255, 100, 100)), (ui_x + 5, y - 2))
         except: pass
         if pygame.mouse.get_pressed()[0] and demolish_rect.collidepoint(m_pos) and not self.popup_active:
             self.selected_building = "demolish"
             self.message = "Mode Destruction actif"
             self.message_color = (255, 100, 100)
         y += 50
-        for k, v in BUILDING_RULES.items():
+        for k, v in self.rules.buildings.items():
             r_btn = pygame.Rect(ui_x, y, cfg.SIDEBAR_WIDTH-20, 40)
             if self.selected_building == k:
                 pygame.draw.rect(self.screen, (60,60,80), r_btn)
@@ -1039,18 +1343,18 @@ class Game:
                 self.screen.blit(icon_mini, r_icon)
             else:
                 pygame.draw.rect(self.screen, (100, 100, 100), (ui_x+5, y+10, 25, 25))
-            self.screen.blit(self.font.render(v['name'], True, cfg.COLORS["text"]), (ui_x + 35, y+2))
+            self.screen.blit(self.text.render(self.font, v['name'], True, cfg.COLORS["text"]), (ui_x + 35, y+2))
             cw, cs = v['cost'].get('wood',0), v['cost'].get('stones',0)
             is_free = (k in ["sawmill", "quarry"] and self.building_counts[k] == 0 and (self.resources["wood"] < cw or self.resources["stones"] < cs))
             cost_str = "Gratuit (Secours)" if is_free else f"Bois:{cw}  Pierre:{cs}"
-            self.screen.blit(self.small_font.render(cost_str, True, (150, 255, 150) if is_free else (180,180,180)), (ui_x+35, y+20))
+            self.screen.blit(self.text.render(self.small_font, cost_str, True, (150, 255, 150) if is_free else (180,180,180)), (ui_x+35, y+20))
             if pygame.mouse.get_pressed()[0] and r_btn.collidepoint(m_pos) and not self.popup_active:
                 self.selected_building = k
                 self.message = f"Mode Construction : {v['name']}"
                 self.message_color = cfg.COLORS["text"]
             y += 45
         pygame.draw.line(self.screen, (100,100,100), (ui_x, cfg.SCREEN_HEIGHT-40), (cfg.SCREEN_WIDTH-10, cfg.SCREEN_HEIGHT-40), 1)
-        self.screen.blit(self.small_font.render(self.message, True, self.message_color), (ui_x, cfg.SCREEN_HEIGHT-30))
+        self.screen.blit(self.text.render(self.small_font, self.message, True, self.message_color), (ui_x, cfg.SCREEN_HEIGHT-30))
 
     def _draw_popups_and_overlays(self):
         if self.game_over:
@@ -1062,7 +1366,7 @@ class Game:
             pygame.draw.rect(self.screen, (40, 40, 50), box, border_radius=10)
             pygame.draw.rect(self.screen, (200, 200, 200), box, 2, border_radius=10)
             def center_text(txt, font, color, dy):
-                ts = font.render(txt, True, color)
+                ts = self.text.render(font, txt, True, color)
                 self.screen.blit(ts, ts.get_rect(center=(cx, cy - 210 + dy)))
             center_text("SIMULATION TERMINÉE", self.title_font, (255,255,255), 40)
             center_text(f"Virtuosité Totale : +{self.final_stats['virtuosity']}", self.timer_font, (100,255,100), 100)
@@ -1075,11 +1379,11 @@ class Game:
             self.quit_rect = pygame.Rect(0, 0, 160, 50); self.quit_rect.center = (cx + 85, cy + 110)
             pygame.draw.rect(self.screen, (50, 150, 50), self.retry_rect, border_radius=8)
             pygame.draw.rect(self.screen, (100, 255, 100), self.retry_rect, 2, border_radius=8)
-            t_re = self.font.render("RECOMMENCER", True, (255,255,255))
+            t_re = self.text.render(self.font, "RECOMMENCER", True, (255,255,255))
             self.screen.blit(t_re, t_re.get_rect(center=self.retry_rect.center))
             pygame.draw.rect(self.screen, (150, 50, 50), self.quit_rect, border_radius=8)
             pygame.draw.rect(self.screen, (255, 100, 100), self.quit_rect, 2, border_radius=8)
-            t_qu = self.font.render("QUITTER", True, (255,255,255))
+            t_qu = self.text.render(self.font, "QUITTER", True, (255,255,255))
             self.screen.blit(t_qu, t_qu.get_rect(center=self.quit_rect.center))
             return
         if self.popup_active:
@@ -1101,12 +1405,12 @@ class Game:
                 border_col = (255, 80, 80)
             pygame.draw.rect(self.screen, (50, 50, 60), p_rect, border_radius=12)
             pygame.draw.rect(self.screen, border_col, p_rect, 3, border_radius=12)
-            t = self.timer_font.render(self.popup_data["title"], True, border_col)
+            t = self.text.render(self.timer_font, self.popup_data["title"], True, border_col)
             self.screen.blit(t, t.get_rect(center=(px+w//2, py+40)))
             y_txt = py + 90
             for i, line in enumerate(self.popup_data["message"].split('\n')):
                 c = border_col if (i==0 and "VIABILITÉ" in line) else (255,255,255)
-                l = self.font.render(line, True, c)
+                l = self.text.render(self.font, line, True, c)
                 self.screen.blit(l, l.get_rect(center=(px+w//2, y_txt)))
                 y_txt += 25
             btn_w, btn_h = 120, 40
@@ -1114,18 +1418,18 @@ class Game:
                 self.popup_rect_cancel = pygame.Rect(px + 40, py + h - 60, btn_w, btn_h)
                 self.popup_rect_ok = pygame.Rect(px + w - 40 - btn_w, py + h - 60, btn_w, btn_h)
                 pygame.draw.rect(self.screen, (100, 50, 50), self.popup_rect_cancel, border_radius=8)
-                tc = self.font.render("ANNULER", True, (255,255,255))
+                tc = self.text.render(self.font, "ANNULER", True, (255,255,255))
                 self.screen.blit(tc, tc.get_rect(center=self.popup_rect_cancel.center))
                 bg_ok = (border_col[0]//3, border_col[1]//3, border_col[2]//3)
                 pygame.draw.rect(self.screen, bg_ok, self.popup_rect_ok, border_radius=8)
                 pygame.draw.rect(self.screen, border_col, self.popup_rect_ok, 1, border_radius=8)
-                tok = self.font.render("CONFIRMER", True, border_col)
+                tok = self.text.render(self.font, "CONFIRMER", True, border_col)
                 self.screen.blit(tok, tok.get_rect(center=self.popup_rect_ok.center))
             else:
                 self.popup_rect_ok = pygame.Rect(px + (w-btn_w)//2, py + h - 60, btn_w, btn_h)
                 self.popup_rect_cancel = None
                 pygame.draw.rect(self.screen, (100, 100, 120), self.popup_rect_ok, border_radius=8)
-                tok = self.font.render("OK", True, (255,255,255))
+                tok = self.text.render(self.font, "OK", True, (255,255,255))
                 self.screen.blit(tok, tok.get_rect(center=self.popup_rect_ok.center))
 
     def trigger_ai_suggestion(self):
@@ -1134,8 +1438,7 @@ class Game:
         
         self.message = "IA (Deep Learning) calcule..."
         # On force le dessin pour que le joueur voie le message immédiatement
-        self.draw()
-        pygame.display.flip()
+        self._present()
         
         # APPEL DE L'IA ENTRAÎNÉE
         suggestion = self._consult_deep_learning()
@@ -1143,17 +1446,16 @@ class Game:
         if suggestion:
             val, b_key, sx, sy = suggestion
             
-            self.ai_suggestion = {
+            # Active l'affichage de la suggestion pendant X secondes
+            self._show_ai_suggestion({
                 'x': sx, 
                 'y': sy, 
                 'building': b_key, 
                 'action': val
-            }
-            # Active l'affichage de la suggestion pendant X secondes
-            self.ai_suggestion_end_time = pygame.time.get_ticks() + (cfg.AI_SUGGESTION_DURATION * 1000)
+            })
             
             type_act = "CONSTRUIRE" if val > 0 else "DÉTRUIRE"
-            nom_bat = BUILDING_RULES[b_key]['name']
+            nom_bat = self.rules.buildings[b_key]['name']
             self.message = f"IA Suggère : {type_act} {nom_bat}"
             self.message_color = (0, 255, 255) if val > 0 else (255, 100, 100)
         else:
@@ -1215,30 +1517,24 @@ class Game:
         logic_game.virtuosity = float(self.resources["virtuosity"])
         
         # 3. Sync Grille et Compteurs
-        logic_game.forest_mask = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH))
-        logic_game.mountain_mask = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH))
-        logic_game.plain_mask = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH))
-        logic_game.river_mask = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH))
-        logic_game.grid_types = logic_game.grid_types.astype(object)
+        logic_game.forest_mask = self.terrain.masks["forest"].astype(float)
+        logic_game.mountain_mask = self.terrain.masks["mountain"].astype(float)
+        logic_game.plain_mask = self.terrain.masks["plain"].astype(float)
+        logic_game.river_mask = self.terrain.masks["river"].astype(float)
         
         # Reset compteurs logiques
         if hasattr(logic_game, 'buildings'):
             for k in logic_game.buildings: logic_game.buildings[k] = 0
 
-        for y in range(cfg.MAP_HEIGHT):
-            for x in range(cfg.MAP_WIDTH):
-                terrain = self.map_data[y][x]
-                if terrain == "forest": logic_game.forest_mask[y, x] = 1.0
-                elif terrain == "mountain": logic_game.mountain_mask[y, x] = 1.0
-                elif terrain == "river": logic_game.river_mask[y, x] = 1.0
-                elif terrain == "plain": logic_game.plain_mask[y, x] = 1.0
-                
-                b_name = self.buildings_grid[y][x]
-                if b_name:
-                    logic_game.grid_types[y, x] = b_name
-                    logic_game.occupied_mask[y, x] = 1
-                    if hasattr(logic_game, 'buildings') and b_name in logic_game.buildings:
-                        logic_game.buildings[b_name] += 1
+        # Les IDs de la grille moteur sont ceux de terrapolis_logic (même Rules.json compilé)
+        logic_game.grid_types[:] = self.building_grid
+        logic_game.occupied_mask[:] = self.building_grid != 0
+        if hasattr(logic_game, 'buildings'):
+            counts = np.bincount(self.building_grid.ravel(), minlength=self.rules.count)
+            for b_name in logic_game.buildings:
+                if b_name in BUILDING_IDS: logic_game.buildings[b_name] += int(counts[BUILDING_IDS[b_name]])
+        logic_game.sync_counters()
+        logic_game.refresh_terrain()
 
         # 4. Actions Légales
         actions = logic_game.get_legal_actions()
@@ -1246,23 +1542,9 @@ class Game:
             print("IA: Bloquée (0 actions).")
             return None
 
-        # 5. Simulation Batch
-        batch_m = []
-        batch_r = []
-        for action in actions:
-            virtual_game = logic_game.copy()
-            virtual_game.step(action)
-            m, r = self.ai_model.encode_state(virtual_game)
-            batch_m.append(m)
-            batch_r.append(r)
-            
-        if not batch_m: return None
-
-        # 6. Prédiction (Scores bruts)
-        with torch.no_grad():
-            bm = torch.cat(batch_m).to(self.ai_device)
-            br = torch.cat(batch_r).to(self.ai_device)
-            values = self.ai_model(bm, br) # Tenseur des scores
+        # 5. Simulation Batch + 6. Prédiction (Scores bruts)
+        # Toutes les actions candidates sont simulées en lockstep (BatchTerrapolisGame)
+        values, _, _ = self.ai_model.evaluate_actions(logic_game, actions, self.ai_device)
 
         # =========================================================================
         # ### COUCHE D'INSTINCT DE SURVIE (ANTI-OSCILLATION) ###
@@ -1313,7 +1595,7 @@ class Game:
                 _, r, c = action
                 # On regarde quel bâtiment est visé sur la grille VISUELLE (engine)
                 # Attention: r=y, c=x pour l'accès grille
-                target_building = self.buildings_grid[r][c]
+                target_building = self._building_at(c, r)
                 
                 # Protection de la Scierie
                 if target_building == "sawmill" and current_wood < SAFE_STOCK:
@@ -1341,7 +1623,7 @@ class Game:
             return None
         if p0 == "DESTROY" or p0 == "destroy":
             _, r, c = best_action
-            b_name = self.buildings_grid[r][c]
+            b_name = self._building_at(c, r)
             if b_name: return (-1, b_name, c, r)
             return None
         if p0 == "BUILD" or p0 == "build":
@@ -1349,49 +1631,52 @@ class Game:
             return (1, b_name, c, r)
         if len(best_action) == 3:
             b_name, r, c = best_action
-            if b_name in BUILDING_RULES: return (1, b_name, c, r)
+            if b_name in self.rules.buildings: return (1, b_name, c, r)
 
         print(f"IA: Action non reconnue : {best_action}")
         return None
 
     # --- NETWORK ---
 
-    def _get_game_state_string(self):
+    def _get_game_state_codes(self):
         """
-        Génère la grille complète pour le mobile.
+        Grille complète pour le mobile (tableau 1D, orientation mobile).
         PRIORITÉ : INONDATION (99) > BÂTIMENT > TERRAIN
         """
-        combined_grid = np.zeros((cfg.MAP_HEIGHT, cfg.MAP_WIDTH), dtype=int)
-        
-        for y in range(cfg.MAP_HEIGHT):
-            for x in range(cfg.MAP_WIDTH):
-                # 1. PRIORITÉ ABSOLUE : L'INONDATION
-                if hasattr(self, 'flooded_grid') and self.flooded_grid[y][x]:
-                    combined_grid[y][x] = 99  # Code 99 = Boue / Inondation
-                else:
-                    # 2. Sinon, on regarde le terrain
-                    terrain = self.map_data[y][x]
-                    val = 0
-                    if terrain == "plain": val = 1
-                    elif terrain == "mountain": val = 2
-                    elif terrain == "forest": val = 3
-                    elif terrain == "river": val = 4
-                    combined_grid[y][x] = val
-                    
-                    # 3. Et on regarde s'il y a un bâtiment par dessus
-                    b_name = self.buildings_grid[y][x]
-                    if b_name and b_name in BUILDING_TO_ID:
-                        combined_grid[y][x] = BUILDING_TO_ID[b_name]
+        # 1. Le terrain : les TERRAIN_IDS sont déjà les codes Unity (1=Plaine ... 4=Rivière)
+        combined_grid = self.terrain_grid.astype(int)
+
+        # 2. Les bâtiments par dessus (code réseau par ID de règle, 0 = non transmis)
+        wire_codes = np.array([BUILDING_TO_ID.get(name, 0) for name in self.rules.names], dtype=int)
+        codes = wire_codes[self.building_grid]
+        combined_grid[codes != 0] = codes[codes != 0]
+
+        # 3. PRIORITÉ ABSOLUE : L'INONDATION
+        combined_grid[self.flooded_grid] = 99  # Code 99 = Boue / Inondation
 
         # Rotation pour correspondre à l'orientation du mobile
-        rotated_grid = np.rot90(combined_grid, k=1)
-        
+        return np.rot90(combined_grid, k=1).ravel()
+
+    def _get_game_state_string(self):
         # Conversion en une seule ligne de texte (ex: "1,1,2,99,1...")
-        return ",".join(map(str, rotated_grid.flatten()))
+        return ",".join(map(str, self._get_game_state_codes().tolist()))
 
     def _send_map_to_mobile(self, addr):
-        map_data = self._get_game_state_string()
-        self.network.send_to(map_data, addr)
+        # Mise en file : une seule carte par client et par frame, sérialisée au flush (état le plus récent)
+        self.outbox.queue_map(addr)
+
+    def _flush_outbox(self):
+        self.outbox.flush(self.clock.get_ticks() / 1000.0, self._write_map, self.network.send_to)
+
+    def _write_map(self, addr):
+        stream = self.state_streams.get(addr)
+        if stream is None:
+            # Protocole historique : la grille complète à chaque envoi
+            self.network.send_to(self._get_game_state_string(), addr)
+            return
+        # Protocole delta : seules les cases modifiées (keyframe si demandée ou périodique)
+        message = stream.encode(self._get_game_state_codes(), self.resources)
+        if message: self.network.send_to(message, addr)
 
     def _handle_mobile_build(self, tile_index, building_id, addr, typeEnvoie):
         """Reçoit un index Mobile, convertit et construit (Correction Coordonnées)."""
@@ -1422,13 +1707,13 @@ class Game:
             return
 
         # Case déjà occupée ?
-        if self.buildings_grid[py_row][py_col] is not None:
+        if self.building_grid[py_row, py_col]:
              print("[ERREUR] Case occupée")
              self.network.send_to("RESULT,ERROR", addr)
              return
 
         # Règles et Coûts
-        rules = BUILDING_RULES.get(building_name)
+        rules = self.rules.buildings.get(building_name)
         
         # Sauvegarde de la sélection actuelle
         old_selection = self.selected_building
@@ -1445,7 +1730,7 @@ class Game:
             if typeEnvoie == 1:
                 self._send_map_to_mobile(addr) 
             else :
-                map_str = self._get_ar_map_string(addr)
+                map_str = self._get_ar_map_string()
                     
                 # IMPORTANT : Votre script Unity UDP_generationMap.cs écoute sur le port 5006.
                 # Le message entrant 'addr' contient le port d'envoi (ex: 56789), 
@@ -1459,17 +1744,35 @@ class Game:
         
         self.selected_building = old_selection
 
+    def tick(self, dt):
+        """Une frame après les événements : minuteries d'interface, rechargement des règles, simulation, rendu."""
+        # Rechargement des règles entre deux frames : l'état de la partie est conservé
+        now_ms = self.clock.get_ticks()
+        self.ui_timers.run_due(now_ms)
+        if not self.headless and self.frame_stats_interval > 0 and now_ms - self.last_frame_stats_time > self.frame_stats_interval * 1000:
+            self._report_frame_stats()
+            self.last_frame_stats_time = now_ms
+        if now_ms - self.last_rules_check_time > (cfg.RULES_CHECK_INTERVAL * 1000):
+            self._check_rules_reload()
+            self.last_rules_check_time = now_ms
+        # Logique à pas fixe : le rendu peut ralentir sans changer l'issue de la partie
+        self.advance(dt)
+        self._present()
+
     def run(self):
         running = True
         while running:
-            dt = self.clock.tick(cfg.FPS) / 1000.0
-            if self.popup_active: dt = 0
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT: running = False
-                elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                    self._handle_click(event.pos)
-            self.update_game_logic(dt)
-            self.draw()
-            pygame.display.flip()
+            if self.headless:
+                # Pas d'événements souris ni de popup local : seule la simulation avance
+                dt = self.clock.tick(cfg.HEADLESS_TICK_RATE) / 1000.0
+            else:
+                dt = self.clock.tick(cfg.FPS) / 1000.0
+                if self.popup_active: dt = 0
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT: running = False
+                    elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                        self._handle_click(event.pos)
+            self.tick(dt)
+        self.network.stop()
         pygame.quit()
-        sys.exit()
\ No newline at end of file
+        sys.exit()
@@ -0,0 +1,58 @@
+# flood.py
+import random
+
+import numpy as np
+
+
+def grow_flood(bank_mask, target, rng=random, bank_cells=None):
+    """
+    Zone inondée : croissance aléatoire de régions connexes (4-connexité) sur les berges.
+    Une graine est tirée parmi les berges encore sèches, puis la région s'étend en tirant
+    au hasard une case de sa frontière, jusqu'à `target` cases ou épuisement des berges.
+
+    - bank_mask  : cases inondables (TerrainAnalysis.flood_candidates)
+    - rng        : objet `random.Random` (ou le module random) pour des crues reproductibles
+    - bank_cells : index plat des berges précalculé (TerrainAnalysis.bank_cells)
+
+    Frontière et sélection sont tenues dans des tableaux de booléens, les tirages par
+    échange avec le dernier élément : coût linéaire en taille de zone, même sur de longues rivières.
+    Retourne le masque booléen des cases inondées.
+    """
+    bank_mask = np.asarray(bank_mask, dtype=bool)
+    H, W = bank_mask.shape
+    bank = bank_mask.ravel()
+    if bank_cells is None: bank_cells = np.flatnonzero(bank)
+
+    dry = bank_cells.tolist()                      # Berges encore sèches (graines possibles)
+    dry_pos = np.full(H * W, -1, dtype=np.int64)
+    dry_pos[bank_cells] = np.arange(len(dry))
+    flooded = np.zeros(H * W, dtype=bool)
+    queued = np.zeros(H * W, dtype=bool)
+    count = 0
+
+    def take(cells, i):
+        """Retire et renvoie cells[i] en O(1) (échange avec le dernier)."""
+        cells[i], cells[-1] = cells[-1], cells[i]
+        return cells.pop()
+
+    while count < target and dry:
+        frontier = [dry[rng.randrange(len(dry))]]
+        queued[frontier[0]] = True
+        while frontier and count < target:
+            cell = take(frontier, rng.randrange(len(frontier)))
+            queued[cell] = False
+            flooded[cell] = True
+            count += 1
+            # Retrait de la liste des berges sèches (la dernière prend sa place)
+            i, last = dry_pos[cell], dry[-1]
+            dry[i], dry_pos[last] = last, i
+            dry.pop()
+
+            y, x = divmod(cell, W)
+            for n, inside in ((cell - W, y > 0), (cell + W, y < H - 1), (cell - 1, x > 0), (cell + 1, x < W - 1)):
+                if inside and bank[n] and not flooded[n] and not queued[n]:
+                    queued[n] = True
+                    frontier.append(n)
+        queued[frontier] = False
+
+    return flooded.reshape(H, W)
@@ -0,0 +1,29 @@
+# frame_stats.py
+from collections import deque
+
+import numpy as np
+
+
+class FrameStats:
+    """Durées de rendu des dernières frames (fenêtre glissante) : moyenne, p95, max."""
+
+    def __init__(self, window=300):
+        self.samples = deque(maxlen=window)
+
+    def add(self, ms):
+        self.samples.append(ms)
+
+    def summary(self):
+        if not self.samples: return {"frames": 0, "mean_ms": 0.0, "p95_ms": 0.0, "max_ms": 0.0}
+        data = np.fromiter(self.samples, dtype=float)
+        return {"frames": len(data), "mean_ms": float(data.mean()),
+                "p95_ms": float(np.percentile(data, 95)), "max_ms": float(data.max())}
+
+    def report(self, text_cache=None):
+        """Ligne de bilan pour la console ; inclut l'efficacité du cache de texte s'il est fourni."""
+        s = self.summary()
+        line = f"frame moy {s['mean_ms']:.2f} ms | p95 {s['p95_ms']:.2f} ms | max {s['max_ms']:.2f} ms ({s['frames']} frames)"
+        if text_cache is not None:
+            line += (f" | texte : {text_cache.hit_rate() * 100:.0f} % en cache, "
+                     f"{text_cache.misses} rendus ({text_cache.render_ms:.1f} ms)")
+        return line
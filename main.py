@@ -1,10 +1,42 @@
 # main.py
 import sys
 import engine
+import network
+from sim_clock import VirtualClock
+
+
+def _seed(args):
+    """--seed N : crues reproductibles (Game(flood_seed=N)), None si absent."""
+    if "--seed" not in args: return None
+    try:
+        return int(args[args.index("--seed") + 1])
+    except (IndexError, ValueError):
+        print("Usage : --seed <entier>")
+        sys.exit()
 
 if __name__ == "__main__":
     try:
-        game_instance = engine.Game()
+        args = sys.argv[1:]
+        seed = _seed(args)
+        if "--fast-forward" in args:
+            # Partie complète en accéléré (horloge virtuelle, sans rendu ni socket) puis bilan
+            game_instance = engine.Game(headless=True, clock=VirtualClock(), flood_seed=seed,
+                                        server=network.OfflineServer())
+            elapsed = game_instance.fast_forward()
+            print(f"Partie simulée en {elapsed:.1f} s (x{game_instance.sim_time / max(elapsed, 1e-9):.0f} temps réel)")
+            print(game_instance.final_stats)
+            sys.exit()
+
+        if "--sessions" in args:
+            # Plusieurs parties headless sur le même port, routées par préfixe "<session>|"
+            import sessions
+            sessions.SessionHost().run()
+            sys.exit()
+
+        # --headless : serveur sans fenêtre (Unity seul client, machines sans écran)
+        game_instance = engine.Game(headless="--headless" in args, flood_seed=seed)
+        # --frame-stats : temps de rendu et efficacité du cache de texte en console toutes les 5 s
+        if "--frame-stats" in args: game_instance.frame_stats_interval = 5.0
         game_instance.run()
     except KeyboardInterrupt:
         sys.exit()
\ No newline at end of file
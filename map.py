@@ -1,9 +1,11 @@
 import numpy as np
-import json
 import os
 import time
 from datetime import datetime
 
+from rules_manager import get_rules
+from terrain_analysis import TerrainAnalysis
+
 # --- CONFIGURATION ---
 _H, _W = 10, 15
 _building_names = [
@@ -66,13 +68,15 @@ river = np.array([
 
 class TerrapolisAI:
     def __init__(self):
-        self.rules = self.load_rules("Rules.json")
+        self.rules = self.load_rules()
         self.tile_layers_data = {
             'mountain': mountain,
             'plain': plain,
             'forest': forest,
             'river': river
         }
+        # Cases autorisées par Rules.json, par ID de bâtiment (terrain statique : calculé une fois)
+        self.placement = self.rules.placement_mask(TerrainAnalysis(self.tile_layers_data).ids)
         self.rng = np.random.default_rng()
         
         # Initialisation des matrices dummy (état interne de l'IA)
@@ -95,22 +99,10 @@ class TerrapolisAI:
         self.neg_ban = {b: np.zeros((_H, _W), dtype=bool) for b in _building_names}
         self.iteration_count = 0
 
-    def load_rules(self, filename="Rules.json"):
-        candidates = [
-            filename,
-            os.path.join(os.getcwd(), filename),
-            os.path.join(os.path.dirname(os.path.abspath(__file__)), filename)
-        ]
-        for p in candidates:
-            if os.path.exists(p):
-                try:
-                    with open(p, 'r', encoding='utf-8') as f:
-                        print(f"[IA] Règles chargées depuis: {p}")
-                        return json.load(f)
-                except:
-                    pass
-        print("[IA] ERREUR: Rules.json non trouvé.")
-        return None
+    def load_rules(self, filename=None):
+        rules = get_rules(filename)
+        print(f"[IA] Règles chargées depuis: {rules.path}")
+        return rules
 
     def _detect_tile_at(self, r, c):
         # Cette fonction reste utile pour l'adjacence, mais on ne l'utilisera plus
@@ -241,61 +233,8 @@ class TerrapolisAI:
                 neg_final[self.neg_ban[bname]] = 0
                 self.neg_ban[bname][:] = False
 
-            # --- FILTRAGE JSON RULES (MODIFIÉ) ---
-            if self.rules:
-                b_rules = self.rules.get('buildings', {}).get(bname, {})
-                placement = b_rules.get('placement', {})
-                
-                # 1. Terrains interdits (Utilisation de masques pour être sûr)
-                forbidden = placement.get('placementForbiddenTiles', [])
-                
-                # Si 'mountain' est interdit, on annule le score partout où mountain == 1
-                if 'mountain' in forbidden:
-                    pos[self.tile_layers_data['mountain'] == 1] = 0
-                    
-                if 'river' in forbidden:
-                    pos[self.tile_layers_data['river'] == 1] = 0
-                    
-                if 'forest' in forbidden:
-                    pos[self.tile_layers_data['forest'] == 1] = 0
-                    
-                if 'plain' in forbidden:
-                    pos[self.tile_layers_data['plain'] == 1] = 0
-                
-                # 2. Adjacence requise (requiresAdjacentTile et operatesIfAdjacentTo)
-                # On combine les deux listes car si l'un manque, c'est bloquant pour l'IA
-                req_list = placement.get('placementRequiresAdjacentTile', [])
-                needs_list = placement.get('operatesIfAdjacentTo', [])
-                
-                # Fusionner les listes si elles existent
-                all_reqs = []
-                if req_list: all_reqs.extend(req_list)
-                if needs_list: all_reqs.extend(needs_list)
-                
-                if all_reqs:
-                    # On crée un masque des zones valides (qui ont au moins un voisin requis)
-                    valid_mask = np.zeros((_H, _W), dtype=bool)
-                    
-                    # Pour chaque type de terrain requis
-                    for req_type in all_reqs:
-                        if req_type in self.tile_layers_data:
-                            layer = self.tile_layers_data[req_type]
-                            # On regarde si chaque case a un voisin == 1 dans ce layer
-                            # (Technique simple: décalage des matrices)
-                            padded = np.pad(layer, pad_width=1, mode='constant', constant_values=0)
-                            
-                            # Voisins Haut, Bas, Gauche, Droite
-                            up = padded[:-2, 1:-1]
-                            down = padded[2:, 1:-1]
-                            left = padded[1:-1, :-2]
-                            right = padded[1:-1, 2:]
-                            
-                            # Si un voisin existe, la case devient valide pour ce type
-                            has_neighbor = (up | down | left | right)
-                            valid_mask |= (has_neighbor == 1)
-                    
-                    # On ne garde que les scores sur les cases valides
-                    pos[~valid_mask] = 0
+            # --- FILTRAGE JSON RULES (masque compilé : tuiles interdites + adjacence requise) ---
+            pos[~self.placement[self.rules.ids[bname]]] = 0
 
             pos_scores[bname] = pos
             neg_scores[bname] = neg_final
@@ -1,57 +1,155 @@
+import asyncio
+import re
 import socket
 import threading
 import queue
 
+import wire
+
 # Configuration
 UDP_IP = "0.0.0.0" # Écoute tout le monde
 UDP_PORT = 5005
+SEND_QUEUE_SIZE = 256 # Messages sortants en attente au-delà desquels on jette (UDP : pas de garantie de toute façon)
+SESSION_PREFIX = re.compile(rb"[A-Za-z0-9_-]{1,32}\|") # "<session>|<commande>" (sessions.py)
+
+
+class _DatagramProtocol(asyncio.DatagramProtocol):
+    """Callbacks asyncio du socket, exécutés dans le thread de la boucle réseau."""
+
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        self.server._on_datagram(data, addr)
+
+    def error_received(self, exc):
+        print(f"[RÉSEAU] Erreur socket: {exc}")
+
+    # Contre-pression : le transport signale que son tampon d'envoi est plein / vidé
+    def pause_writing(self):
+        self.server.paused = True
+
+    def resume_writing(self):
+        self.server.paused = False
+        self.server._flush()
+
 
 class TerrapolisServer:
-    def __init__(self, game_engine):
+    """
+    Transport UDP asyncio sur sa propre boucle d'événements (thread démon).
+    - Entrée : chaque datagramme est décodé (texte ou binaire wire.py) puis déposé dans
+      command_queue, que engine.py vide à chaque frame (get_nowait).
+    - Sortie : send_to() ne touche jamais le socket ; il dépose le message dans une file bornée,
+      vidée par la boucle réseau. File pleine (client lent, tampon noyau saturé) : le message
+      est jeté et compté dans `dropped`, le thread de rendu ne bloque jamais.
+    """
+
+    def __init__(self, game_engine, send_queue_size=SEND_QUEUE_SIZE):
         self.game = game_engine
-        # Création du socket UDP
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        
-        # Liaison au port
+        self.running = True
+        self.command_queue = queue.Queue() # File d'attente pour parler au Thread principal
+        self.outbox = queue.Queue(maxsize=send_queue_size)
+        self.paused = False
+        self.sent = 0
+        self.dropped = 0
+        self._wakeup_pending = False
+        self.transport = None
+
+        # Démarrer la boucle réseau en arrière-plan (on attend seulement la création du socket)
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run_loop, args=(ready,))
+        self.thread.daemon = True # Se ferme quand le jeu se ferme
+        self.thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._open())
+        finally:
+            ready.set()
+        self.loop.run_forever()
+
+    async def _open(self):
+        protocol = lambda: _DatagramProtocol(self)
         try:
-            self.sock.bind((UDP_IP, UDP_PORT))
+            self.transport, _ = await self.loop.create_datagram_endpoint(
+                protocol, local_addr=(UDP_IP, UDP_PORT), allow_broadcast=True)
             print(f"[RÉSEAU] Serveur UDP démarré sur le port {UDP_PORT}")
         except Exception as e:
             print(f"[RÉSEAU] Erreur de démarrage (Port occupé ?): {e}")
+            # Comme avant : on peut encore envoyer, depuis un port éphémère
+            self.transport, _ = await self.loop.create_datagram_endpoint(
+                protocol, family=socket.AF_INET, allow_broadcast=True)
 
-        self.running = True
-        self.command_queue = queue.Queue() # File d'attente pour parler au Thread principal
-        
-        # Démarrer le thread d'écoute en arrière-plan
-        self.thread = threading.Thread(target=self._listen_loop)
-        self.thread.daemon = True # Se ferme quand le jeu se ferme
-        self.thread.start()
-        
+    # --- ENTRÉE (THREAD RÉSEAU) ---
 
-    def _listen_loop(self):
-        while self.running:
-            try:
-                # Cette ligne attend un message (bloquante), d'où l'utilisation d'un Thread
-                data, addr = self.sock.recvfrom(1024)
+    def _on_datagram(self, data, addr):
+        # Préfixe de session éventuel, conservé tel quel devant la commande décodée
+        prefix = SESSION_PREFIX.match(data)
+        if prefix: prefix, data = prefix.group(0).decode('ascii'), data[prefix.end():]
+        else: prefix = ""
+        try:
+            if wire.is_binary(data):
+                # Commande binaire (wire.py) : traduite en son équivalent texte pour engine.py
+                message = wire.decode_command(data)
+            else:
                 message = data.decode('utf-8').strip()
-                
-                # On ajoute le message dans la file pour que engine.py le traite
-                self.command_queue.put((message, addr))
-            except Exception as e:
-                # Ignorer les erreurs de fermeture
-                if self.running:
-                    print(f"[RÉSEAU] Erreur écoute: {e}")
+        except Exception as e:
+            print(f"[RÉSEAU] Erreur écoute: {e}")
+            return
+        # On ajoute le message dans la file pour que engine.py le traite
+        self.command_queue.put((prefix + message, addr))
+
+    # --- SORTIE ---
 
     def send_to(self, message, addr):
+        # Texte (str) ou paquet déjà encodé (bytes, format binaire wire.py). Non bloquant.
+        if isinstance(message, str): message = message.encode('utf-8')
         try:
-            self.sock.sendto(message.encode('utf-8'), addr)
-        except Exception as e:
-            print(f"[RÉSEAU] Erreur envoi: {e}")
-            
+            self.outbox.put_nowait((message, addr))
+        except queue.Full:
+            self.dropped += 1
+            return
+        # Un seul réveil de la boucle réseau par rafale de messages
+        if not self._wakeup_pending and self.running:
+            self._wakeup_pending = True
+            self.loop.call_soon_threadsafe(self._flush)
+
+    def _flush(self):
+        """Thread réseau : vide la file sortante tant que le transport accepte des données."""
+        self._wakeup_pending = False
+        while not self.paused and self.transport is not None:
+            try:
+                message, addr = self.outbox.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                self.transport.sendto(message, addr)
+                self.sent += 1
+            except Exception as e:
+                print(f"[RÉSEAU] Erreur envoi: {e}")
+
     def stop(self):
         self.running = False
+        if self.dropped: print(f"[RÉSEAU] {self.dropped} message(s) sortant(s) jeté(s) (file pleine)")
         try:
-            self.sock.close()
+            if self.transport is not None: self.loop.call_soon_threadsafe(self.transport.close)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=1.0)
         except:
-            pass
\ No newline at end of file
+            pass
+
+
+class OfflineServer:
+    """Serveur sans socket (même interface) : parties simulées hors ligne, ex. main.py --fast-forward."""
+
+    def __init__(self):
+        self.command_queue = queue.Queue()
+
+    def send_to(self, message, addr):
+        pass
+
+    def stop(self):
+        pass
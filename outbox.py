@@ -0,0 +1,68 @@
+# outbox.py
+
+
+class ClientOutbox:
+    """Ce qui attend le prochain flush() pour un client."""
+
+    def __init__(self):
+        self.map_pending = False
+        self.popups = []            # (TYPE, titre, message) dans l'ordre d'arrivée
+        self.last_popup_at = None   # Instant du dernier paquet POPUP envoyé
+
+
+def merge_popups(popups):
+    """
+    Un seul paquet POPUP,TYPE,titre,message pour plusieurs popups :
+    ERROR l'emporte sur les autres types, titre du plus récent suivi du nombre de popups regroupés,
+    messages distincts empilés sur plusieurs lignes ("|" = retour à la ligne côté mobile).
+    """
+    kind, title, message = popups[-1]
+    if len(popups) > 1:
+        if any(k == "ERROR" for k, _, _ in popups): kind = "ERROR"
+        title = f"{title} (+{len(popups) - 1})"
+        message = "|".join(dict.fromkeys(m for _, _, m in popups))
+    return f"POPUP,{kind},{title},{message}"
+
+
+class Outbox:
+    """
+    Messages sortants par client, vidés une fois par frame (engine.Game._flush_outbox) :
+    - carte : plusieurs demandes dans la même frame = un seul envoi, sérialisé au moment du flush
+      (donc l'état le plus récent) ;
+    - popups : au plus un paquet par client toutes les `popup_interval` secondes ; ceux qui arrivent
+      entre-temps sont fusionnés (merge_popups) dans le paquet suivant.
+    """
+
+    def __init__(self, popup_interval=1.0):
+        self.popup_interval = popup_interval
+        self.clients = {}
+        self.coalesced = 0      # Envois évités (cartes et popups regroupés)
+
+    def _client(self, addr):
+        client = self.clients.get(addr)
+        if client is None: client = self.clients[addr] = ClientOutbox()
+        return client
+
+    def queue_map(self, addr):
+        client = self._client(addr)
+        if client.map_pending: self.coalesced += 1
+        client.map_pending = True
+
+    def queue_popup(self, addr, kind, title, message):
+        client = self._client(addr)
+        if client.popups: self.coalesced += 1
+        client.popups.append((kind, title, message))
+
+    def flush(self, now, send_map, send):
+        """
+        send_map(addr) sérialise et envoie la carte ; send(message, addr) envoie un paquet.
+        La carte part avant les popups, comme lorsque les envois étaient immédiats.
+        """
+        for addr, client in self.clients.items():
+            if client.map_pending:
+                client.map_pending = False
+                send_map(addr)
+            if client.popups and (client.last_popup_at is None or now - client.last_popup_at >= self.popup_interval):
+                send(merge_popups(client.popups), addr)
+                client.popups.clear()
+                client.last_popup_at = now
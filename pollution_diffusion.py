@@ -0,0 +1,102 @@
+# pollution_diffusion.py
+import numpy as np
+
+DIRECT_MAX_TAPS = 32   # Au-delà, convolution séparable ou FFT plutôt que décalages successifs
+
+
+def spread_kernel(radius, share=0.5, falloff=0.5):
+    """
+    Noyau en losange (distance de Manhattan 1..radius, centre exclu) :
+    une case reçoit share * falloff**(d-1) de l'émission d'une source à distance d.
+    radius = 1 redonne la propagation historique aux 4 voisins (50 %).
+    """
+    radius = max(0, int(radius))
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    dist = np.abs(dy) + np.abs(dx)
+    kernel = share * np.power(float(falloff), np.maximum(dist - 1, 0))
+    kernel[(dist == 0) | (dist > radius)] = 0.0
+    return kernel
+
+
+class PollutionDiffusion:
+    """
+    Diffusion d'une grille d'émissions par un noyau quelconque (dimensions impaires,
+    kernel[dy, dx] = part reçue par la case décalée de (dy, dx) par rapport à la source).
+    Le calcul est choisi une fois selon le noyau :
+    - peu de coefficients : somme de grilles décalées (cas courant, rayon 1)
+    - noyau de rang 1     : deux passes 1D (coût linéaire en rayon)
+    - sinon               : FFT (coût indépendant du rayon, adapté aux grandes cartes)
+    Les bords sont absorbants : rien n'est diffusé hors de la carte.
+    """
+
+    def __init__(self, kernel):
+        self.kernel = np.asarray(kernel, dtype=float)
+        kh, kw = self.kernel.shape
+        if kh % 2 == 0 or kw % 2 == 0:
+            raise ValueError(f"Noyau de diffusion de dimensions paires : {self.kernel.shape}")
+        self.ry, self.rx = kh // 2, kw // 2
+        self.non_negative = bool((self.kernel >= 0).all())
+
+        ys, xs = np.nonzero(self.kernel)
+        self._taps = [(y - self.ry, x - self.rx, self.kernel[y, x]) for y, x in zip(ys.tolist(), xs.tolist())]
+        self._factors = None
+        if len(self._taps) > DIRECT_MAX_TAPS:
+            u, s, vt = np.linalg.svd(self.kernel)
+            if s.size < 2 or s[1] <= 1e-12 * s[0]:
+                self._factors = (u[:, 0] * s[0], vt[0])
+        self.method = "direct" if len(self._taps) <= DIRECT_MAX_TAPS else "separable" if self._factors else "fft"
+        self._fft_cache = {}
+
+    @classmethod
+    def from_rules(cls, rules, share=0.5, falloff=0.5):
+        """Diffusion au rayon common.pollutionSpreadRadius de Rules.json (1 par défaut)."""
+        return cls(spread_kernel(rules.common.get("pollutionSpreadRadius", 1), share, falloff))
+
+    def apply(self, emission):
+        """Pollution reçue par chaque case (même forme que `emission`)."""
+        emission = np.asarray(emission, dtype=float)
+        if self.method == "direct":
+            out = self._direct(emission)
+        elif self.method == "separable":
+            out = self._axis_pass(self._axis_pass(emission, self._factors[0], 0), self._factors[1], 1)
+        else:
+            out = self._fft(emission)
+        return np.maximum(out, 0.0) if self.non_negative and self.method == "fft" else out
+
+    def sources(self, emission, y, x):
+        """Détail de apply() pour la seule case (y, x) : [(index plat de la source, quantité reçue)]."""
+        H, W = emission.shape
+        received = []
+        for dy, dx, w in self._taps:
+            sy, sx = y - dy, x - dx
+            if 0 <= sy < H and 0 <= sx < W and emission[sy, sx] != 0:
+                received.append((sy * W + sx, w * emission[sy, sx]))
+        return received
+
+    # --- MÉTHODES DE CALCUL ---
+
+    def _direct(self, emission):
+        H, W = emission.shape
+        padded = np.zeros((H + 2 * self.ry, W + 2 * self.rx))
+        for dy, dx, w in self._taps:
+            padded[self.ry + dy:self.ry + dy + H, self.rx + dx:self.rx + dx + W] += w * emission
+        return padded[self.ry:self.ry + H, self.rx:self.rx + W]
+
+    @staticmethod
+    def _axis_pass(grid, weights, axis):
+        """Convolution 1D le long de `axis` (bords absorbants)."""
+        g = np.moveaxis(grid, axis, 0)
+        n, r = g.shape[0], len(weights) // 2
+        padded = np.zeros((n + 2 * r,) + g.shape[1:])
+        for i, w in enumerate(weights):
+            if w: padded[i:i + n] += w * g
+        return np.moveaxis(padded[r:r + n], 0, axis)
+
+    def _fft(self, emission):
+        H, W = emission.shape
+        shape = (H + 2 * self.ry, W + 2 * self.rx)
+        k_hat = self._fft_cache.get(shape)
+        if k_hat is None:
+            k_hat = self._fft_cache[shape] = np.fft.rfft2(self.kernel, shape)
+        full = np.fft.irfft2(np.fft.rfft2(emission, shape) * k_hat, shape)
+        return full[self.ry:self.ry + H, self.rx:self.rx + W]
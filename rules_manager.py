@@ -2,21 +2,47 @@
 import json
 import os
 import sys
+import time
+
+import numpy as np
+
+from terrain_analysis import TERRAINS, TERRAIN_IDS, adjacent_mask
 # On n'a plus besoin d'importer settings ici car on ne lit plus les couleurs
 
+RULES_FILE = "Rules.json"
+
 class RulesLoader:
     @staticmethod
-    def load(filename="Rules.json"):
-        if not os.path.exists(filename):
-            print(f"ERREUR CRITIQUE: '{filename}' introuvable !")
-            sys.exit()
+    def resolve(filename=None):
+        """
+        Chemin absolu du fichier de règles : `filename` s'il est donné (dossier courant, puis dossier du module),
+        sinon variable TERRAPOLIS_RULES_PATH, puis Rules.json. FileNotFoundError s'il est introuvable.
+        """
+        here = os.path.dirname(os.path.abspath(__file__))
+        if filename:
+            candidates = [filename, os.path.join(here, filename)]
+        else:
+            candidates = [os.environ.get('TERRAPOLIS_RULES_PATH'), RULES_FILE, os.path.join(here, RULES_FILE)]
+        for p in candidates:
+            if p and os.path.exists(p):
+                return os.path.abspath(p)
+        raise FileNotFoundError(f"'{filename or RULES_FILE}' introuvable")
+
+    @staticmethod
+    def read(filename=None):
+        with open(RulesLoader.resolve(filename), 'r', encoding='utf-8') as f:
+            return json.load(f)
 
-        with open(filename, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+    @staticmethod
+    def load(filename=None):
+        data = RulesLoader.read(filename)
+        return RulesLoader.parse(data), data["common"]["adjacentModifiers"]
 
-        adj_modifiers = data["common"]["adjacentModifiers"]
+    @staticmethod
+    def parse(data):
+        """Règles au format du moteur (engine.py), indexées par nom de bâtiment."""
         buildings_rules = {}
-        
+
         for key, b_data in data["buildings"].items():
             placement = b_data.get("placement", {})
             construction = b_data.get("construction", {})
@@ -24,9 +50,9 @@ class RulesLoader:
             operation = b_data.get("operation", {})
             events = b_data.get("events", {})
             additional = b_data.get("additionalInstances", {})
-            
+
             cost_dict = additional.get("cost", construction.get("cost", {"wood": 0, "stones": 0}))
-            
+
             needs_adj = placement.get("operatesIfAdjacentTo") or None
             req_adj = placement.get("placementRequiresAdjacentTile") or None
             poll_spread_sec = operation.get("pollutionSpreadAfterSec") or 0
@@ -63,6 +89,194 @@ class RulesLoader:
             }
             buildings_rules[key] = rule
 
-        return buildings_rules, adj_modifiers
+        return buildings_rules
+
+    @staticmethod
+    def flatten(data):
+        """Règles à plat de la simulation d'entraînement (terrapolis_logic.py)."""
+        flat_buildings = {}
+
+        for b_name, b_data in data['buildings'].items():
+            costs = b_data.get('additionalInstances', {}).get('cost', {})
+            construct = b_data.get('construction', {})
+            operation = b_data.get('operation', {})
+            events = b_data.get('events', {})
+            production = b_data.get('production', {}) # Connexion Production
+
+            placement = b_data.get('placement', {})
+            adj_req = None
+            if 'operatesIfAdjacentTo' in placement:
+                adj_req = placement['operatesIfAdjacentTo'][0]
+            elif 'placementRequiresAdjacentTile' in placement:
+                adj_req = placement['placementRequiresAdjacentTile'][0]
+
+            flat_buildings[b_name] = {
+                "cost_wood": costs.get('wood', 0),
+                "cost_stone": costs.get('stones', 0),
+                "virt": construct.get('virtuosityGain', 0),
+                "virt_sec": operation.get('virtuosityPerSec', 0),
+                "poll": construct.get('pollutionOnBuild', 0),
+                "poll_sec": operation.get('emitsPerSec', 0),
+
+                # Paramètres de Production
+                "prod_resource": production.get('resource', None),
+                "prod_rate": production.get('ratePerSec', 0),
+
+                "adj_req": adj_req,
+                "firstFree": b_data.get('firstFree', False),
+                "destroy_penalty": events.get('onPlayerDestroy', {}).get('loseVirtuosityAmount', 0)
+            }
+
+        return flat_buildings
+
+
+class CompiledRules:
+    """
+    Rules.json compilé une seule fois en vecteurs NumPy indexés par ID de bâtiment
+    (0 = case vide, 1..N dans l'ordre du fichier). Les dictionnaires historiques
+    (format moteur et format logique) restent disponibles pour l'affichage.
+    """
+
+    def __init__(self, data, path=None, mtime=None):
+        self.raw = data
+        self.path = path
+        self.mtime = mtime
+
+        self.buildings = RulesLoader.parse(data)
+        self.flat = RulesLoader.flatten(data)
+        self.adjacent_modifiers = data["common"]["adjacentModifiers"]
+        self.common = data["common"]
+
+        # --- IDENTIFIANTS ---
+        self.names = [""] + list(data["buildings"].keys())
+        self.ids = {name: i for i, name in enumerate(self.names) if name}
+        self.count = len(self.names)
+
+        # --- COÛTS ET ÉCONOMIE ---
+        self.cost_wood = self._vector(lambda name, r: r["cost"].get("wood", 0))
+        self.cost_stone = self._vector(lambda name, r: r["cost"].get("stones", 0))
+        self.first_free = self._vector(lambda name, r: r["first_free"], bool)
+        self.wood_rate = self._vector(lambda name, r: r["production"]["amount"] if r["production"]["resource"] == "wood" else 0)
+        self.stone_rate = self._vector(lambda name, r: r["production"]["amount"] if r["production"]["resource"] == "stones" else 0)
+
+        # --- POLLUTION ET VIRTUOSITÉ ---
+        self.virt_on_build = self._vector(lambda name, r: r["virtuosity_on_build"])
+        self.poll_on_build = self._vector(lambda name, r: r["pollution_on_build"])
+        self.virt_rate = self._vector(lambda name, r: r["virtuosity_per_sec"])
+        self.poll_rate = self._vector(lambda name, r: r["emits_per_sec"])
+        self.destroy_penalty = self._vector(lambda name, r: self.flat[name]["destroy_penalty"])
+        self.virt_loss_on_destroy = self._vector(lambda name, r: r["virtuosity_loss_on_destroy"])
+        self.spreads_pollution = self._vector(lambda name, r: r["spreads_pollution"], bool)
+        self.spread_after_sec = self._vector(lambda name, r: r["pollution_spread_after_sec"])
+        self.river_pollution = self._vector(lambda name, r: r["river_pollution_amount"])
+        self.river_after_sec = self._vector(lambda name, r: r["pollutes_river_after_sec"])
+        self.adjacent_modifier = self._vector(lambda name, r: self.adjacent_modifiers.get(name, 1.0), default=1.0)
+
+        # --- ÉVÉNEMENTS ---
+        self.flood_destroyed = self._vector(lambda name, r: r["on_flood"]["destroyed"], bool)
+        self.flood_score = self._vector(lambda name, r: r["on_flood"]["floodScoreIncrease"])
+
+        # --- PLACEMENT : matrices (bâtiment, terrain) indexées par TERRAIN_IDS ---
+        self.forbidden = self._terrain_table(lambda p: p.get("placementForbiddenTiles", []))
+        self.requires_adj = self._terrain_table(lambda p: p.get("placementRequiresAdjacentTile", []))
+        self.operates_adj = self._terrain_table(lambda p: p.get("operatesIfAdjacentTo", []))
+        self.allowed_anywhere = np.ones(self.count, dtype=bool)
+        for name, b_data in data["buildings"].items():
+            self.allowed_anywhere[self.ids[name]] = b_data.get("placement", {}).get("placementAllowedAnywhere", True)
+
+    def _vector(self, getter, dtype=float, default=0):
+        vec = np.full(self.count, default, dtype=dtype)
+        for name, rule in self.buildings.items():
+            vec[self.ids[name]] = getter(name, rule) or 0
+        return vec
+
+    def _terrain_table(self, getter):
+        table = np.zeros((self.count, len(TERRAINS)), dtype=bool)
+        for name, b_data in self.raw["buildings"].items():
+            for terrain in getter(b_data.get("placement", {})):
+                if terrain in TERRAIN_IDS: table[self.ids[name], TERRAIN_IDS[terrain]] = True
+        return table
+
+    def placement_mask(self, terrain_ids):
+        """
+        Tenseur booléen (nb_IDs, H, W) des cases où chaque bâtiment respecte Rules.json :
+        tuile non interdite et, si exigé, au moins un voisin du type requis.
+        `terrain_ids` est une grille de TERRAIN_IDS (voir TerrainAnalysis.ids).
+        """
+        terrain_ids = np.asarray(terrain_ids)
+        layers = terrain_ids[None] == np.arange(len(TERRAINS))[:, None, None]
+        touching = np.stack([adjacent_mask(layer) for layer in layers])
+
+        required = self.requires_adj | self.operates_adj
+        checked = ~self.allowed_anywhere | self.operates_adj.any(axis=1)
+        has_neighbor = np.tensordot(required.astype(np.int64), touching.astype(np.int64), axes=1) > 0
+
+        mask = ~self.forbidden[:, terrain_ids] & (~checked[:, None, None] | has_neighbor)
+        mask[0] = False
+        return mask
+
+
+def validate_rules(rules, current=None):
+    """Liste des erreurs bloquantes de `rules` (vide si utilisables). `current` : règles en service."""
+    errors = []
+    if current is not None and rules.names != current.names:
+        errors.append("liste des bâtiments modifiée (IDs de la grille et canaux du CNN figés)")
+    for field in ("cost_wood", "cost_stone", "wood_rate", "stone_rate", "virt_rate", "poll_rate",
+                  "virt_on_build", "poll_on_build", "flood_score"):
+        if (getattr(rules, field) < 0).any():
+            errors.append(f"valeur négative dans {field}")
+    for name, b_data in rules.raw["buildings"].items():
+        placement = b_data.get("placement", {})
+        for key in ("placementForbiddenTiles", "placementRequiresAdjacentTile", "operatesIfAdjacentTo"):
+            unknown = [t for t in placement.get(key, []) if t not in TERRAIN_IDS]
+            if unknown: errors.append(f"{name}.{key} : terrain inconnu {unknown}")
+    if (rules.adjacent_modifier <= 0).any():
+        errors.append("adjacentModifiers doit être strictement positif")
+    radius = rules.common.get("pollutionSpreadRadius", 1)
+    if not isinstance(radius, int) or isinstance(radius, bool) or radius < 0:
+        errors.append(f"pollutionSpreadRadius doit être un entier positif ou nul : {radius!r}")
+    return errors
+
+def reload_rules(current):
+    """
+    Recompile le fichier de `current` et le valide.
+    Retourne (règles, erreurs, durée_ms) ; règles vaut None si le fichier est rejeté.
+    """
+    start = time.perf_counter()
+    try:
+        mtime = os.path.getmtime(current.path)
+        # Déjà recompilé par une autre partie du processus (sessions) : mêmes règles partagées
+        cached = _cache.get(current.path)
+        if cached is not None and cached is not current and cached.mtime == mtime:
+            return cached, [], (time.perf_counter() - start) * 1000
+        # Lecture directe du chemin en service (fichier supprimé puis réécrit par un éditeur : OSError, rejet)
+        with open(current.path, 'r', encoding='utf-8') as f:
+            rules = CompiledRules(json.load(f), current.path, mtime)
+    except (OSError, ValueError, KeyError, TypeError, AttributeError, IndexError) as e:
+        return None, [f"fichier illisible : {e}"], (time.perf_counter() - start) * 1000
+    errors = validate_rules(rules, current)
+    if errors:
+        return None, errors, (time.perf_counter() - start) * 1000
+    _cache[current.path] = rules
+    return rules, [], (time.perf_counter() - start) * 1000
+
+
+_cache = {}
+
+def get_rules(filename=None):
+    """Règles compilées, partagées par tous les modules et recompilées seulement si le fichier change (mtime)."""
+    path = RulesLoader.resolve(filename)
+    mtime = os.path.getmtime(path)
+    rules = _cache.get(path)
+    if rules is None or rules.mtime != mtime:
+        rules = CompiledRules(RulesLoader.read(path), path, mtime)
+        _cache[path] = rules
+    return rules
 
-BUILDING_RULES, ADJACENT_MODIFIERS = RulesLoader.load()
\ No newline at end of file
+try:
+    RULES = get_rules()
+except FileNotFoundError as e:
+    # Seul le démarrage s'arrête faute de règles ; un rechargement à chaud garde les anciennes
+    print(f"ERREUR CRITIQUE: {e} !")
+    sys.exit()
+BUILDING_RULES, ADJACENT_MODIFIERS = RULES.buildings, RULES.adjacent_modifiers
@@ -0,0 +1,61 @@
+# scheduler.py
+import heapq
+import itertools
+
+
+class Scheduler:
+    """
+    Minuteries datées sur une file de priorité (heapq).
+    Chaque événement est déclenché une seule fois, au premier run_due(now) où now >= at :
+    le coût par frame ne dépend que des événements échus, pas du nombre de minuteries en attente.
+    L'unité de temps est celle de l'appelant (secondes de simulation, ms d'horloge...).
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()   # Départage les égalités : ordre de programmation
+        self._pending = set()
+        self._cancelled = set()
+
+    def __len__(self):
+        return len(self._pending)
+
+    def schedule(self, at, callback, *args):
+        """Programme callback(*args) à l'instant `at`. Retourne un identifiant pour cancel()."""
+        handle = next(self._seq)
+        heapq.heappush(self._heap, (at, handle, callback, args))
+        self._pending.add(handle)
+        return handle
+
+    def cancel(self, handle):
+        """Annule un événement en attente (sans effet s'il est déjà passé ou inconnu)."""
+        if handle in self._pending:
+            self._pending.discard(handle)
+            self._cancelled.add(handle)
+
+    def clear(self):
+        self._heap.clear()
+        self._pending.clear()
+        self._cancelled.clear()
+
+    def next_time(self):
+        """Instant du prochain événement actif, ou None."""
+        self._drop_cancelled()
+        return self._heap[0][0] if self._heap else None
+
+    def run_due(self, now):
+        """Déclenche, dans l'ordre chronologique, tous les événements échus. Retourne leur nombre."""
+        fired = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, handle, callback, args = heapq.heappop(self._heap)
+            if handle in self._cancelled:
+                self._cancelled.discard(handle)
+                continue
+            self._pending.discard(handle)
+            callback(*args)
+            fired += 1
+        return fired
+
+    def _drop_cancelled(self):
+        while self._heap and self._heap[0][1] in self._cancelled:
+            self._cancelled.discard(heapq.heappop(self._heap)[1])
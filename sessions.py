@@ -0,0 +1,134 @@
+# sessions.py
+import queue
+import time
+
+import engine
+import network
+import settings as cfg
+from scheduler import Scheduler
+
+# Messages sans préfixe "<session>|" : session par défaut (clients mobiles existants)
+DEFAULT_SESSION = "default"
+
+
+def split_session(message):
+    """Ex: "salle1|BUILD,3,6" -> ("salle1", "BUILD,3,6") ; sans préfixe -> (DEFAULT_SESSION, message)."""
+    session_id, sep, command = message.partition("|")
+    return (session_id, command) if sep else (DEFAULT_SESSION, message)
+
+
+class SessionChannel:
+    """Canal d'une session : même interface que network.TerrapolisServer pour engine.Game."""
+
+    def __init__(self, server):
+        self.server = server
+        self.command_queue = queue.Queue()
+
+    def send_to(self, message, addr):
+        self.server.send_to(message, addr)
+
+    def stop(self):
+        pass    # Le socket appartient à SessionHost
+
+
+class Session:
+    def __init__(self, session_id, game, channel, now):
+        self.id = session_id
+        self.game = game
+        self.channel = channel
+        self.last_seen = now    # Dernier message reçu (fermeture après SESSION_IDLE_TIMEOUT)
+        self.last_tick = now
+        self.finished_at = None # Fin de partie sans RESTART (fermeture après SESSION_IDLE_TIMEOUT)
+
+
+class SessionHost:
+    """
+    Plusieurs parties indépendantes (salles) derrière un seul socket UDP :
+    - les datagrammes "<session>|<commande>" sont routés vers la partie de cette session,
+      créée au premier message (au plus MAX_SESSIONS) ; sans préfixe : DEFAULT_SESSION ;
+    - chaque partie est un engine.Game headless avec son propre mobile_address et ses propres flux,
+      mais le modèle IA et les règles compilées sont partagés par tout le processus ; le pont fichiers
+      avec map.py (action.txt / matrix_state.txt) est désactivé, les suggestions passent par IA_TRIGGER ;
+    - une session est fermée après SESSION_IDLE_TIMEOUT s sans message, ou autant de temps après
+      sa fin de partie si le mobile n'a pas envoyé RESTART ;
+    - un Scheduler commun déclenche la frame de chaque session toutes les 1 / tick_rate secondes.
+    """
+
+    def __init__(self, server=None, max_sessions=cfg.MAX_SESSIONS, idle_timeout=cfg.SESSION_IDLE_TIMEOUT,
+                 tick_rate=cfg.HEADLESS_TICK_RATE, clock=time.perf_counter, game_factory=None):
+        self.server = server if server is not None else network.TerrapolisServer(None)
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.tick_interval = 1.0 / tick_rate
+        self.clock = clock
+        self.game_factory = game_factory or (
+            lambda session_id, channel: engine.Game(headless=True, server=channel, session_id=session_id))
+        self.sessions = {}
+        self.scheduler = Scheduler()
+
+    def open(self, session_id, addr=None):
+        """Crée la session (ou None si le serveur est plein)."""
+        if len(self.sessions) >= self.max_sessions:
+            print(f"[SESSIONS] Refus de '{session_id}' : {self.max_sessions} sessions déjà ouvertes")
+            if addr: self.server.send_to("RESULT,ERROR", addr)
+            return None
+        channel = SessionChannel(self.server)
+        now = self.clock()
+        session = Session(session_id, self.game_factory(session_id, channel), channel, now)
+        self.sessions[session_id] = session
+        self.scheduler.schedule(now + self.tick_interval, self._tick, session, now + self.tick_interval)
+        print(f"[SESSIONS] Session '{session_id}' ouverte ({len(self.sessions)}/{self.max_sessions})")
+        return session
+
+    def close(self, session_id):
+        if self.sessions.pop(session_id, None) is not None:
+            print(f"[SESSIONS] Session '{session_id}' fermée")
+
+    def route(self):
+        """Distribue les messages reçus par le socket commun dans la file de chaque session."""
+        while True:
+            try:
+                message, addr = self.server.command_queue.get_nowait()
+            except queue.Empty:
+                return
+            session_id, command = split_session(message)
+            session = self.sessions.get(session_id) or self.open(session_id, addr)
+            if session is None: continue
+            session.last_seen = self.clock()
+            session.channel.command_queue.put((command, addr))
+
+    def _tick(self, session, at):
+        if self.sessions.get(session.id) is not session: return   # Fermée (ou rouverte) entre-temps
+        now = self.clock()
+        if now - session.last_seen > self.idle_timeout:
+            self.close(session.id)
+            return
+        session.game.tick(now - session.last_tick)
+        session.last_tick = now
+        # Partie finie : le mobile peut envoyer RESTART, sinon la salle est libérée
+        if not session.game.game_over: session.finished_at = None
+        elif session.finished_at is None: session.finished_at = now
+        elif now - session.finished_at > self.idle_timeout:
+            self.close(session.id)
+            return
+        # Cadence fixe ; une session en retard saute les frames manquées au lieu de les enchaîner
+        next_at = at + self.tick_interval
+        if next_at <= now: next_at = now + self.tick_interval
+        self.scheduler.schedule(next_at, self._tick, session, next_at)
+
+    def step(self):
+        """Une itération de la boucle serveur : routage puis frames échues. Retourne leur nombre."""
+        self.route()
+        return self.scheduler.run_due(self.clock())
+
+    def run(self):
+        print(f"[SESSIONS] Hébergement multi-sessions ({self.max_sessions} max, préfixe '<session>|')")
+        try:
+            while True:
+                self.step()
+                next_time = self.scheduler.next_time()
+                wait = self.tick_interval if next_time is None else next_time - self.clock()
+                # Réveil au moins à chaque tick pour router les messages entrants
+                time.sleep(min(max(wait, 0.0), self.tick_interval))
+        finally:
+            self.server.stop()
@@ -19,11 +19,30 @@ MAP_OFFSET_Y = 0 # Pas de marge en haut
 # -------------------------
 
 FPS = 60
+HEADLESS_TICK_RATE = 20   # Boucle serveur (sans rendu), en itérations/s
+
+# Hébergement multi-sessions (main.py --sessions) : plusieurs parties sur le même port UDP
+MAX_SESSIONS = 32             # Parties simultanées au plus
+SESSION_IDLE_TIMEOUT = 600.0  # Une session sans message depuis N s est fermée
+
+# Simulation à pas fixe, indépendante du rendu
+SIM_TICK_RATE = 20                  # Pas de logique par seconde
+SIM_DT = 1.0 / SIM_TICK_RATE
+SIM_MAX_STEPS_PER_FRAME = 10        # Rattrapage maximal après une frame lente (ex: inférence IA)
 
 GAME_DURATION = 15 * 60
 MATRIX_SAVE_INTERVAL = 15.0 
 ACTION_FILE_CHECK_INTERVAL = 0.5 
+RULES_CHECK_INTERVAL = 1.0   # Surveillance de Rules.json (rechargement à chaud)
 AI_SUGGESTION_DURATION = 5.0 
+TEXT_CACHE_SIZE = 512        # Textes rendus gardés en mémoire (LRU), 0 = sans cache
+STATE_KEYFRAME_INTERVAL = 50   # Protocole delta : grille complète toutes les N mises à jour
+POPUP_MIN_INTERVAL = 1.0       # Au plus un paquet POPUP par client toutes les N s (les suivants sont fusionnés)
+FRAME_STATS_INTERVAL = 0.0   # Bilan des temps de rendu en console toutes les N s (0 = désactivé, voir --frame-stats)
+
+# Propagation de la pollution (rayon : common.pollutionSpreadRadius de Rules.json)
+POLLUTION_SPREAD_SHARE = 0.5     # Part de l'émission reçue par un voisin direct
+POLLUTION_SPREAD_FALLOFF = 0.5   # Atténuation par case supplémentaire de distance
 
 # Paramètres Inondation
 FLOOD_MIN_INTERVAL = 180
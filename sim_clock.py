@@ -0,0 +1,37 @@
+# sim_clock.py
+import pygame
+
+class RealClock:
+    """Horloge murale (pygame) : tick() attend pour tenir le framerate demandé."""
+
+    def __init__(self):
+        self._clock = pygame.time.Clock()
+
+    def tick(self, fps):
+        """Millisecondes réelles écoulées depuis le tick précédent."""
+        return self._clock.tick(fps)
+
+    def get_ticks(self):
+        return pygame.time.get_ticks()
+
+
+class VirtualClock:
+    """
+    Horloge virtuelle : tick() avance d'une frame nominale (1000 / fps ms) sans attendre.
+    La boucle de jeu tourne alors aussi vite que le CPU le permet, avec une issue
+    identique à une partie en temps réel (tests d'endurance, équilibrage).
+    """
+
+    def __init__(self, start_ms=0.0):
+        self.now_ms = float(start_ms)
+
+    def tick(self, fps):
+        dt_ms = 1000.0 / fps
+        self.now_ms += dt_ms
+        return dt_ms
+
+    def advance(self, ms):
+        self.now_ms += ms
+
+    def get_ticks(self):
+        return int(self.now_ms)
@@ -0,0 +1,82 @@
+# state_stream.py
+import numpy as np
+
+import wire
+
+# Une keyframe complète toutes les N mises à jour, même sans demande du client (rattrape les pertes UDP)
+KEYFRAME_INTERVAL = 50
+
+
+class StateStream:
+    """
+    Flux d'état versionné vers un client (grille de codes déjà orientée pour le mobile) :
+      FULL,<seq>,<c0>,<c1>,...          keyframe : toute la grille
+      DELTA,<seq>,<index>:<code>,...    seulement les cases modifiées depuis l'envoi précédent
+    `seq` augmente de 1 à chaque message. Un client qui voit un trou dans la séquence
+    (paquet perdu) envoie KEYFRAME et reçoit une grille complète au prochain envoi.
+    binary=True : mêmes messages au format wire.py (MSG_FULL / MSG_DELTA, ressources incluses).
+    delta=False : une keyframe à chaque envoi (client binaire sans gestion des deltas).
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, binary=False, delta=True):
+        self.keyframe_interval = keyframe_interval
+        self.binary = binary
+        self.delta = delta
+        self.seq = 0
+        self.last_codes = None          # Grille que le client est censé avoir
+        self.since_keyframe = 0
+        self.keyframe_requested = True
+
+    def request_keyframe(self):
+        self.keyframe_requested = True
+
+    def encode(self, codes, resources=None):
+        """
+        Message à envoyer pour amener le client à `codes` (tableau 1D d'entiers),
+        ou None si rien n'a changé depuis l'envoi précédent.
+        En binaire, `resources` (dict wood/stones/virtuosity) voyage dans chaque message.
+        """
+        codes = np.asarray(codes).ravel()
+        full = (not self.delta or self.keyframe_requested or self.last_codes is None
+                or self.last_codes.shape != codes.shape or self.since_keyframe >= self.keyframe_interval)
+        if full:
+            if self.binary:
+                body = wire.encode_full(self.seq + 1, codes, resources or {})
+            else:
+                body = "FULL," + str(self.seq + 1) + "," + ",".join(map(str, codes.tolist()))
+            self.keyframe_requested = False
+            self.since_keyframe = 0
+        else:
+            changed = np.flatnonzero(codes != self.last_codes)
+            if not changed.size: return None
+            if self.binary:
+                body = wire.encode_delta(self.seq + 1, changed, codes[changed], resources or {})
+            else:
+                cells = ",".join(f"{i}:{c}" for i, c in zip(changed.tolist(), codes[changed].tolist()))
+                body = f"DELTA,{self.seq + 1},{cells}"
+            self.since_keyframe += 1
+        self.seq += 1
+        self.last_codes = codes.copy()
+        return body
+
+
+def apply_message(grid, message):
+    """
+    Côté client (implémentation de référence du protocole) : applique un message FULL/DELTA
+    à `grid` (tableau 1D, ou None avant la première keyframe), texte ou binaire.
+    Retourne (grille, seq).
+    """
+    if isinstance(message, bytes):
+        kind, seq, _, cells = wire.decode_state(message)
+        if kind == wire.MSG_FULL: return cells.astype(int), seq
+        grid = grid.copy()
+        grid[cells["index"]] = cells["code"]
+        return grid, seq
+    kind, seq, *cells = message.split(",")
+    if kind == "FULL":
+        return np.array([int(c) for c in cells]), int(seq)
+    grid = grid.copy()
+    for cell in cells:
+        index, code = cell.split(":")
+        grid[int(index)] = int(code)
+    return grid, int(seq)
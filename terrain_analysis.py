@@ -0,0 +1,76 @@
+# terrain_analysis.py
+import numpy as np
+
+# Types de terrain, indexés par les codes du script Unity UDP_generationMap.cs (0 = vide)
+TERRAINS = ("void", "plain", "mountain", "forest", "river")
+TERRAIN_IDS = {name: i for i, name in enumerate(TERRAINS)}
+
+
+def _neighbours(grid, fill):
+    """Les 4 grilles décalées (haut, bas, gauche, droite) : voisin de chaque case, `fill` hors carte."""
+    padded = np.pad(grid, 1, mode='constant', constant_values=fill)
+    return padded[:-2, 1:-1], padded[2:, 1:-1], padded[1:-1, :-2], padded[1:-1, 2:]
+
+def adjacent_mask(mask):
+    """Cases ayant au moins un voisin (4-connexité) non nul dans `mask` (décalage de matrices)."""
+    up, down, left, right = _neighbours(np.asarray(mask) != 0, False)
+    return up | down | left | right
+
+
+class TerrainAnalysis:
+    """
+    Masques statiques dérivés du terrain, calculés une fois par carte :
+    - masks[t]     : cases de type t
+    - ids          : grille des TERRAIN_IDS (une valeur par case)
+    - adjacent[t]  : cases touchant (4-connexité) au moins une case de type t
+    - flood_candidates : cases de terre ferme bordant la rivière (zone de crue)
+    - bank_cells   : index plat (y * W + x) de ces berges, pour le générateur de crues
+    rebuild() est à rappeler uniquement quand le terrain change (forêt épuisée...).
+    """
+
+    def __init__(self, masks):
+        self.rebuild(masks)
+
+    @classmethod
+    def from_ids(cls, ids):
+        """Construit l'analyse depuis une grille de TERRAIN_IDS (engine.Game.terrain_grid)."""
+        return cls(cls._split(ids))
+
+    @staticmethod
+    def _split(ids):
+        ids = np.asarray(ids)
+        return {name: ids == TERRAIN_IDS[name] for name in TERRAINS[1:]}
+
+    def rebuild(self, masks):
+        self.masks = {name: np.asarray(masks[name]) != 0 for name in TERRAINS[1:] if name in masks}
+        self.adjacent = {name: adjacent_mask(m) for name, m in self.masks.items()}
+        self._unions = {}
+
+        # Grille d'IDs (priorité river > mountain > forest > plain, comme engine._generate_map)
+        self.ids = np.zeros(next(iter(self.masks.values())).shape, dtype=np.uint8)
+        for name in ("plain", "forest", "mountain", "river"):
+            if name in self.masks: self.ids[self.masks[name]] = TERRAIN_IDS[name]
+
+        land = np.zeros(next(iter(self.masks.values())).shape, dtype=bool)
+        for name in ("plain", "mountain", "forest"):
+            if name in self.masks: land |= self.masks[name]
+        if "river" in self.masks:
+            land &= ~self.masks["river"]
+            self.flood_candidates = self.adjacent["river"] & land
+        else:
+            self.flood_candidates = np.zeros_like(land)
+        self.bank_cells = np.flatnonzero(self.flood_candidates)
+
+    def rebuild_from_ids(self, ids):
+        self.rebuild(self._split(ids))
+
+    def adjacent_to(self, targets):
+        """Union des masques d'adjacence pour un type ou une liste de types de terrain."""
+        key = (targets,) if isinstance(targets, str) else tuple(targets)
+        mask = self._unions.get(key)
+        if mask is None:
+            mask = np.zeros_like(self.flood_candidates)
+            for name in key:
+                if name in self.adjacent: mask |= self.adjacent[name]
+            self._unions[key] = mask
+        return mask
@@ -0,0 +1,193 @@
+import numpy as np
+import random
+
+from terrapolis_logic import (TerrapolisGame, BUILDING_IDS, NUM_BUILDING_IDS, NO_BUILDING,
+                              COST_WOOD, COST_STONE, FIRST_FREE, WOOD_RATE, STONE_RATE, POLL_RATE, VIRT_RATE,
+                              VIRT_ON_BUILD, POLL_ON_BUILD, DESTROY_PENALTY,
+                              MAP_H, MAP_W, SECONDS_PER_STEP, TOTAL_STEPS)
+
+_IDS = BUILDING_IDS
+_NB = NUM_BUILDING_IDS
+
+# Code action : 0 = WAIT, -1 = DESTROY, >0 = ID du bâtiment construit
+_WAIT, _DESTROY = 0, -1
+
+FLOOD_POLLUTION = 200
+
+
+class BatchTerrapolisGame:
+    """
+    Version vectorisée de TerrapolisGame : N parties empilées dans des tableaux
+    NumPy, avancées en lockstep par un seul appel à step(actions).
+    Les règles (production, pollution, virtuosité, inondation) sont identiques
+    à TerrapolisGame.step.
+    """
+
+    def __init__(self, n, template=None, flood_turns=None):
+        if template is None:
+            template = TerrapolisGame()
+        self.n = n
+
+        # Terrain partagé par toutes les parties du lot
+        self.mountain_mask = np.array(template.mountain_mask)
+        self.forest_mask = np.array(template.forest_mask)
+        self.river_mask = np.array(template.river_mask)
+        self.plain_mask = np.array(template.plain_mask)
+        self.river_adjacent = template.terrain.adjacent['river']
+        self.placement_masks = template.placement_masks
+
+        # État empilé
+        self.grid = np.zeros((n, MAP_H, MAP_W), dtype=np.uint8)
+        self.wood = np.zeros(n)
+        self.stone = np.zeros(n)
+        self.virtuosity = np.zeros(n)
+        self.pollution_total = np.zeros(n)
+        self.turn = np.zeros(n, dtype=np.int64)
+
+        # Compteurs par ID (colonne 0 = cases vides) et débits cumulés, tenus à jour incrémentalement
+        self.counts = np.zeros((n, _NB), dtype=np.int64)
+        self.counts[:, NO_BUILDING] = MAP_H * MAP_W
+        self.wood_rate = np.zeros(n)
+        self.stone_rate = np.zeros(n)
+        self.poll_rate = np.zeros(n)
+        self.virt_rate = np.zeros(n)
+
+        # 3 inondations par partie, tirées indépendamment, sauf si `flood_turns` (communs au lot) est fourni
+        self.flood_turns = np.zeros((n, TOTAL_STEPS), dtype=bool)
+        if flood_turns is not None:
+            self.flood_turns[:, [t for t in flood_turns if 0 <= t < TOTAL_STEPS]] = True
+        else:
+            for i in range(n):
+                self.flood_turns[i, random.sample(range(TOTAL_STEPS), 3)] = True
+
+        self.stats_built = np.zeros((n, _NB), dtype=np.int64)
+        self.stats_lost_flood = np.zeros((n, _NB), dtype=np.int64)
+        self.stats_lost_player = np.zeros((n, _NB), dtype=np.int64)
+
+    @classmethod
+    def from_game(cls, game, n):
+        """Réplique N fois l'état d'une TerrapolisGame (ex: évaluation de N actions candidates)."""
+        batch = cls(n, template=game, flood_turns=game.flood_turns)
+
+        batch.grid[:] = game.grid_types
+        batch.counts[:] = game.counts
+        batch.wood_rate[:] = game.wood_rate
+        batch.stone_rate[:] = game.stone_rate
+        batch.poll_rate[:] = game.poll_rate
+        batch.virt_rate[:] = game.virt_rate
+
+        batch.wood[:] = game.wood
+        batch.stone[:] = game.stone
+        batch.virtuosity[:] = game.virtuosity
+        batch.pollution_total[:] = game.pollution_total
+        batch.turn[:] = game.turn
+
+        for stats, src in ((batch.stats_built, game.stats_built),
+                           (batch.stats_lost_flood, game.stats_lost_flood),
+                           (batch.stats_lost_player, game.stats_lost_player)):
+            for name, count in src.items():
+                stats[:, _IDS[name]] = count
+        return batch
+
+    @property
+    def occupied_mask(self):
+        return self.grid != 0
+
+    def legal_action_mask(self):
+        """Tenseur (N, nb_bâtiments, H, W) des constructions légales de chaque partie."""
+        free = FIRST_FREE[1:] & (self.counts[:, 1:] == 0)
+        affordable = ((self.wood[:, None] >= np.where(free, 0, COST_WOOD[1:]))
+                      & (self.stone[:, None] >= np.where(free, 0, COST_STONE[1:])))
+        return (self.placement_masks[None] & (self.grid == NO_BUILDING)[:, None]
+                & affordable[:, :, None, None])
+
+    def _count(self, games, b_ids, delta):
+        """Ajoute `delta` instances de b_ids (un par partie de `games`) aux compteurs et débits."""
+        np.add.at(self.counts, (games, b_ids), delta)
+        self.wood_rate[games] += delta * WOOD_RATE[b_ids]
+        self.stone_rate[games] += delta * STONE_RATE[b_ids]
+        self.poll_rate[games] += delta * POLL_RATE[b_ids]
+        self.virt_rate[games] += delta * VIRT_RATE[b_ids]
+
+    def _encode_actions(self, actions):
+        kinds = np.zeros(self.n, dtype=np.int64)
+        rows = np.zeros(self.n, dtype=np.int64)
+        cols = np.zeros(self.n, dtype=np.int64)
+        for i, (b_name, r, c) in enumerate(actions):
+            if b_name == "WAIT":
+                kinds[i] = _WAIT
+            elif b_name == "DESTROY":
+                kinds[i] = _DESTROY
+            else:
+                kinds[i] = _IDS[b_name]
+            rows[i], cols[i] = r, c
+        return kinds, rows, cols
+
+    def step(self, actions):
+        """
+        Avance les N parties d'un tour.
+        `actions` : N tuples (b_name, r, c) au format de TerrapolisGame.step.
+        Retourne le score (virtuosité - pollution) de chaque partie.
+        """
+        if len(actions) != self.n:
+            raise ValueError(f"{len(actions)} actions pour {self.n} parties")
+        kinds, rows, cols = self._encode_actions(actions)
+        games = np.arange(self.n)
+
+        # 1. Production
+        self.wood += self.wood_rate * SECONDS_PER_STEP
+        self.stone += self.stone_rate * SECONDS_PER_STEP
+
+        # 2. Temps
+        self.pollution_total += self.poll_rate * SECONDS_PER_STEP
+        self.virtuosity += self.virt_rate * SECONDS_PER_STEP
+
+        # 3a. Destructions
+        sel = games[kinds == _DESTROY]
+        if sel.size:
+            target = self.grid[sel, rows[sel], cols[sel]]
+            sel, target = sel[target != 0], target[target != 0]
+            self.grid[sel, rows[sel], cols[sel]] = 0
+            self._count(sel, target, -1)
+            self.counts[sel, NO_BUILDING] += 1
+            self.virtuosity[sel] -= DESTROY_PENALTY[target]
+            np.add.at(self.stats_lost_player, (sel, target), 1)
+
+        # 3b. Constructions (la première instance d'un bâtiment firstFree est gratuite)
+        sel = games[kinds > 0]
+        if sel.size:
+            b_ids = kinds[sel]
+            previous = self.grid[sel, rows[sel], cols[sel]].astype(np.int64)
+            self._count(sel, previous, -1)
+            self._count(sel, b_ids, 1)
+            free = FIRST_FREE[b_ids] & (self.counts[sel, b_ids] == 1)
+            self.grid[sel, rows[sel], cols[sel]] = b_ids
+            self.wood[sel] -= np.where(free, 0, COST_WOOD[b_ids])
+            self.stone[sel] -= np.where(free, 0, COST_STONE[b_ids])
+            self.virtuosity[sel] += VIRT_ON_BUILD[b_ids]
+            self.pollution_total[sel] += POLL_ON_BUILD[b_ids]
+            np.add.at(self.stats_built, (sel, b_ids), 1)
+
+        # 4. Inondation : détruit tout bâtiment adjacent à la rivière
+        in_range = self.turn < TOTAL_STEPS
+        flooding = np.zeros(self.n, dtype=bool)
+        flooding[in_range] = self.flood_turns[games[in_range], self.turn[in_range]]
+        if flooding.any():
+            hit = (self.grid != 0) & self.river_adjacent[None] & flooding[:, None, None]
+            offsets = (games * _NB)[:, None]
+            flat = (np.where(hit, self.grid, 0).reshape(self.n, -1).astype(np.int64) + offsets).ravel()
+            lost = np.bincount(flat, minlength=self.n * _NB).reshape(self.n, _NB)
+            lost[:, NO_BUILDING] = 0
+            self.counts -= lost
+            self.counts[:, NO_BUILDING] += lost.sum(axis=1)
+            self.wood_rate -= lost @ WOOD_RATE
+            self.stone_rate -= lost @ STONE_RATE
+            self.poll_rate -= lost @ POLL_RATE
+            self.virt_rate -= lost @ VIRT_RATE
+            self.pollution_total += FLOOD_POLLUTION * lost.sum(axis=1)
+            self.virtuosity -= lost @ VIRT_ON_BUILD
+            self.stats_lost_flood += lost
+            self.grid[hit] = 0
+
+        self.turn += 1
+        return self.virtuosity - self.pollution_total
@@ -1,8 +1,5 @@
 import numpy as np
 import random
-import copy
-import json
-import os
 import sys
 
 # --- IMPORT SECURISE ---
@@ -12,56 +9,39 @@ except ImportError:
     print("ERREUR CRITIQUE: Le fichier 'IA_Dumb.py' est introuvable.")
     sys.exit()
 
+from rules_manager import get_rules
+from terrain_analysis import TerrainAnalysis
+
 # --- CONFIGURATION TEMPORELLE ---
 MAP_H, MAP_W = 10, 15
 SECONDS_PER_STEP = 13
 TOTAL_STEPS = 60
 
-# --- CHARGEMENT INTELLIGENT DU JSON ---
-def load_and_flatten_rules():
-    if not os.path.exists('Rules.json'):
-        print("ERREUR: Rules.json introuvable.")
-        sys.exit()
-        
-    with open('Rules.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    flat_buildings = {}
-    
-    for b_name, b_data in data['buildings'].items():
-        costs = b_data.get('additionalInstances', {}).get('cost', {})
-        construct = b_data.get('construction', {})
-        operation = b_data.get('operation', {})
-        events = b_data.get('events', {})
-        production = b_data.get('production', {}) # Connexion Production
-        
-        placement = b_data.get('placement', {})
-        adj_req = None
-        if 'operatesIfAdjacentTo' in placement:
-            adj_req = placement['operatesIfAdjacentTo'][0]
-        elif 'placementRequiresAdjacentTile' in placement:
-            adj_req = placement['placementRequiresAdjacentTile'][0]
-
-        flat_buildings[b_name] = {
-            "cost_wood": costs.get('wood', 0),
-            "cost_stone": costs.get('stones', 0),
-            "virt": construct.get('virtuosityGain', 0),      
-            "virt_sec": operation.get('virtuosityPerSec', 0),
-            "poll": construct.get('pollutionOnBuild', 0),
-            "poll_sec": operation.get('emitsPerSec', 0),
-            
-            # Paramètres de Production
-            "prod_resource": production.get('resource', None),
-            "prod_rate": production.get('ratePerSec', 0),
-            
-            "adj_req": adj_req,
-            "firstFree": b_data.get('firstFree', False),
-            "destroy_penalty": events.get('onPlayerDestroy', {}).get('loseVirtuosityAmount', 0)
-        }
-        
-    return flat_buildings
+# --- RÈGLES COMPILÉES (rules_manager, partagées avec le moteur et les IA) ---
+RULES = get_rules()
+BUILDINGS = RULES.flat
+
+# --- IDENTIFIANTS ENTIERS DES BATIMENTS (ordre de Rules.json) ---
+# La grille de jeu stocke des uint8 : 0 = case vide, 1..N = bâtiment.
+NO_BUILDING = 0
+BUILDING_NAMES = RULES.names   # ID -> nom
+BUILDING_IDS = RULES.ids
+NUM_BUILDING_IDS = RULES.count
+
+# Règles vectorisées, indexées par ID (l'indice 0, case vide, vaut 0)
+COST_WOOD = RULES.cost_wood
+COST_STONE = RULES.cost_stone
+FIRST_FREE = RULES.first_free
+VIRT_ON_BUILD = RULES.virt_on_build
+POLL_ON_BUILD = RULES.poll_on_build
+DESTROY_PENALTY = RULES.destroy_penalty
+
+# Débits par seconde
+WOOD_RATE = RULES.wood_rate
+STONE_RATE = RULES.stone_rate
+POLL_RATE = RULES.poll_rate
+VIRT_RATE = RULES.virt_rate
 
-BUILDINGS = load_and_flatten_rules()
 
 class TerrapolisGame:
     def __init__(self):
@@ -82,10 +62,19 @@ class TerrapolisGame:
         self.forest_mask   = np.array(self.masks.get('forest'))
         self.river_mask    = np.array(self.masks.get('river'))
         self.plain_mask    = np.array(self.masks.get('plain'))
+        self.refresh_terrain()
 
         # 2. État du jeu
         self.occupied_mask = np.zeros((MAP_H, MAP_W), dtype=bool)
-        self.grid_types = np.full((MAP_H, MAP_W), "", dtype=object)
+        self.grid_types = np.zeros((MAP_H, MAP_W), dtype=np.uint8)   # IDs (BUILDING_IDS)
+
+        # Compteurs par ID (indice 0 = cases vides) et débits cumulés, tenus à jour par _set_cell
+        self.counts = np.zeros(NUM_BUILDING_IDS, dtype=np.int64)
+        self.counts[NO_BUILDING] = MAP_H * MAP_W
+        self.wood_rate = 0.0
+        self.stone_rate = 0.0
+        self.poll_rate = 0.0
+        self.virt_rate = 0.0
         
         # PHASE 3 : PAUVRETÉ (Ressources à 0)
         self.wood = 0 
@@ -104,94 +93,145 @@ class TerrapolisGame:
         self.stats_lost_player = {}
         
     def copy(self):
-        return copy.deepcopy(self)
+        # Les masques de terrain ne sont jamais modifiés par step() : ils sont partagés.
+        clone = self.__class__.__new__(self.__class__)
+        clone.__dict__.update(self.__dict__)
+        clone.flood_turns = set(self.flood_turns)
+        clone.occupied_mask = self.occupied_mask.copy()
+        clone.grid_types = self.grid_types.copy()
+        clone.counts = self.counts.copy()
+        clone.stats_built = dict(self.stats_built)
+        clone.stats_lost_flood = dict(self.stats_lost_flood)
+        clone.stats_lost_player = dict(self.stats_lost_player)
+        return clone
+
+    # --- SNAPSHOT / RESTORE ---
+    def snapshot(self):
+        """Capture compacte de l'état mutable (grilles de taille fixe + scalaires)."""
+        return (self.occupied_mask.copy(), self.grid_types.copy(), self.counts.copy(),
+                self.wood, self.stone, self.virtuosity, self.pollution_total, self.turn,
+                self.wood_rate, self.stone_rate, self.poll_rate, self.virt_rate,
+                dict(self.stats_built), dict(self.stats_lost_flood), dict(self.stats_lost_player))
+
+    def restore(self, snap):
+        """Remet la partie dans l'état capturé par snapshot(). Le snapshot reste réutilisable."""
+        occupied, grid, counts, self.wood, self.stone, self.virtuosity, self.pollution_total, self.turn, \
+            self.wood_rate, self.stone_rate, self.poll_rate, self.virt_rate, \
+            built, lost_flood, lost_player = snap
+        np.copyto(self.occupied_mask, occupied)
+        np.copyto(self.grid_types, grid)
+        np.copyto(self.counts, counts)
+        self.stats_built = dict(built)
+        self.stats_lost_flood = dict(lost_flood)
+        self.stats_lost_player = dict(lost_player)
+
+    # --- COMPTEURS INCRÉMENTAUX ---
+    def _set_cell(self, r, c, b_id):
+        """Pose (b_id > 0) ou retire (b_id = 0) un bâtiment en tenant compteurs et débits à jour."""
+        old = self.grid_types[r, c]
+        self.counts[old] -= 1
+        self.counts[b_id] += 1
+        self.wood_rate += WOOD_RATE[b_id] - WOOD_RATE[old]
+        self.stone_rate += STONE_RATE[b_id] - STONE_RATE[old]
+        self.poll_rate += POLL_RATE[b_id] - POLL_RATE[old]
+        self.virt_rate += VIRT_RATE[b_id] - VIRT_RATE[old]
+        self.grid_types[r, c] = b_id
+        self.occupied_mask[r, c] = b_id != NO_BUILDING
+
+    def sync_counters(self):
+        """Recalcule compteurs et débits après une écriture directe dans grid_types."""
+        self.counts = np.bincount(self.grid_types.ravel(), minlength=NUM_BUILDING_IDS).astype(np.int64)
+        self.wood_rate = float(self.counts @ WOOD_RATE)
+        self.stone_rate = float(self.counts @ STONE_RATE)
+        self.poll_rate = float(self.counts @ POLL_RATE)
+        self.virt_rate = float(self.counts @ VIRT_RATE)
+
+    # --- ACTIONS LÉGALES ---
+    def refresh_terrain(self):
+        """
+        Précalcule l'analyse du terrain et les emplacements constructibles par bâtiment
+        (plaine + adjacence requise).
+        À rappeler si les masques de terrain sont remplacés après l'initialisation.
+        """
+        self.terrain = TerrainAnalysis({
+            'plain': self.plain_mask, 'mountain': self.mountain_mask,
+            'forest': self.forest_mask, 'river': self.river_mask,
+        })
+        adjacency = self.terrain.adjacent
+        plain = self.terrain.masks['plain']
+        self.placement_masks = np.empty((NUM_BUILDING_IDS - 1, MAP_H, MAP_W), dtype=bool)
+        for b_name, stats in BUILDINGS.items():
+            req = adjacency.get(stats.get('adj_req'))
+            self.placement_masks[BUILDING_IDS[b_name] - 1] = plain if req is None else plain & req
 
     def is_valid_pos(self, r, c, b_name):
         if r < 0 or r >= MAP_H or c < 0 or c >= MAP_W: return False
         if self.occupied_mask[r, c]: return False
-        if self.plain_mask[r, c] == 0: return False 
+        return bool(self.placement_masks[BUILDING_IDS[b_name] - 1, r, c])
 
-        req_type = BUILDINGS[b_name].get('adj_req')
-        target_mask = None
-        if req_type == 'forest': target_mask = self.forest_mask
-        elif req_type == 'mountain': target_mask = self.mountain_mask
-        elif req_type == 'river': target_mask = self.river_mask
-        
-        if target_mask is not None:
-            has_adj = False
-            for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-                nr, nc = r+dr, c+dc
-                if 0 <= nr < MAP_H and 0 <= nc < MAP_W:
-                    if target_mask[nr, nc]: has_adj = True; break
-            if not has_adj: return False
-        return True
+    def affordable(self):
+        """Booléen par bâtiment (IDs 1..N) : ressources suffisantes, premier exemplaire gratuit inclus."""
+        free = FIRST_FREE[1:] & (self.counts[1:] == 0)
+        cw = np.where(free, 0, COST_WOOD[1:])
+        cs = np.where(free, 0, COST_STONE[1:])
+        return (self.wood >= cw) & (self.stone >= cs)
+
+    def legal_action_mask(self):
+        """
+        Tenseur booléen (nb_bâtiments, H, W) des constructions légales : emplacement
+        valide, case libre et coût abordable. La ligne i correspond à l'ID i + 1.
+        """
+        return self.placement_masks & ~self.occupied_mask[None] & self.affordable()[:, None, None]
 
     def get_legal_actions(self):
         actions = [("WAIT", -1, -1)]
-        affordable = []
         
-        # Options Construction
-        for b_name, stats in BUILDINGS.items():
-            count = np.sum(self.grid_types == b_name)
-            cw = stats.get('cost_wood', 0)
-            cs = stats.get('cost_stone', 0)
-            if stats.get('firstFree', False) and count == 0: cw, cs = 0, 0
-            if self.wood >= cw and self.stone >= cs: affordable.append(b_name)
-        
-        for b in affordable:
-            attempts = 0; found = 0
-            while attempts < 30 and found < 3:
-                r = random.randint(0, MAP_H-1)
-                c = random.randint(0, MAP_W-1)
-                if self.is_valid_pos(r, c, b):
-                    actions.append((b, r, c)); found += 1
-                attempts += 1
+        # Options Construction (énumération exhaustive du masque légal)
+        b_idx, rows, cols = np.nonzero(self.legal_action_mask())
+        for b, r, c in zip(b_idx.tolist(), rows.tolist(), cols.tolist()):
+            actions.append((BUILDING_NAMES[b + 1], r, c))
                 
         # Options Destruction
-        rows, cols = np.where(self.occupied_mask)
-        for i in range(len(rows)):
-            actions.append(("DESTROY", rows[i], cols[i]))
+        rows, cols = np.nonzero(self.occupied_mask)
+        for r, c in zip(rows.tolist(), cols.tolist()):
+            actions.append(("DESTROY", r, c))
 
-        return list(set(actions))
+        return actions
 
     # PARAMETRE VERBOSE=FALSE PAR DEFAUT (Pour l'entraînement)
     def step(self, action, verbose=False):
+        self.apply(action, verbose)
+        return self.virtuosity - self.pollution_total
+
+    # --- MAKE / UNMAKE (recherche arborescente sans copie) ---
+    def apply(self, action, verbose=False):
+        """
+        Joue `action` sur place (mêmes règles que step) et retourne un enregistrement
+        d'annulation à passer à undo() pour revenir exactement à l'état précédent.
+        """
         b_name, r, c = action
+        previous = (self.wood, self.stone, self.virtuosity, self.pollution_total)
+        prev_cell = self.grid_types[r, c] if b_name != "WAIT" else NO_BUILDING
+        flooded = None
         
-        # 1. PRODUCTION DYNAMIQUE (JSON)
-        prod_wood = 0
-        prod_stone = 0
-        for b_key, stats in BUILDINGS.items():
-            count = np.sum(self.grid_types == b_key)
-            if count > 0:
-                res_type = stats.get('prod_resource')
-                rate = stats.get('prod_rate', 0)
-                amount = count * rate * SECONDS_PER_STEP
-                if res_type == 'wood': prod_wood += amount
-                elif res_type == 'stones': prod_stone += amount
-        self.wood += prod_wood
-        self.stone += prod_stone
+        # 1. PRODUCTION DYNAMIQUE (JSON) - débits cumulés tenus à jour par _set_cell
+        self.wood += self.wood_rate * SECONDS_PER_STEP
+        self.stone += self.stone_rate * SECONDS_PER_STEP
         
         # 2. Temps
-        tick_poll = 0; tick_virt = 0  
-        for b_key, stats in BUILDINGS.items():
-            count = np.sum(self.grid_types == b_key)
-            if count > 0:
-                tick_poll += count * stats.get('poll_sec', 0)
-                tick_virt += count * stats.get('virt_sec', 0)
-        self.pollution_total += tick_poll * SECONDS_PER_STEP
-        self.virtuosity += tick_virt * SECONDS_PER_STEP 
+        self.pollution_total += self.poll_rate * SECONDS_PER_STEP
+        self.virtuosity += self.virt_rate * SECONDS_PER_STEP 
 
         # 3. Actions
         if b_name == "WAIT":
             pass
             
         elif b_name == "DESTROY":
-            target_b = self.grid_types[r, c]
-            if target_b != "":
-                penalty = BUILDINGS[target_b].get('destroy_penalty', 0)
-                self.occupied_mask[r, c] = False
-                self.grid_types[r, c] = ""
+            target_id = self.grid_types[r, c]
+            if target_id != NO_BUILDING:
+                target_b = BUILDING_NAMES[target_id]
+                penalty = DESTROY_PENALTY[target_id]
+                self._set_cell(r, c, NO_BUILDING)
                 self.virtuosity -= penalty
                 self.stats_lost_player[target_b] = self.stats_lost_player.get(target_b, 0) + 1
                 
@@ -199,20 +239,18 @@ class TerrapolisGame:
                     print(f"DESTRUCTION : {target_b} en ({r}, {c}) (Malus: -{penalty})")
 
         else:
-            self.occupied_mask[r, c] = True
-            self.grid_types[r, c] = b_name
-            stats = BUILDINGS[b_name]
-            
-            cw = stats.get('cost_wood', 0)
-            cs = stats.get('cost_stone', 0)
-            count = np.sum(self.grid_types == b_name)
-            if stats.get('firstFree', False) and count == 1: cw, cs = 0, 0
+            b_id = BUILDING_IDS[b_name]
+            self._set_cell(r, c, b_id)
+
+            cw = COST_WOOD[b_id]
+            cs = COST_STONE[b_id]
+            if FIRST_FREE[b_id] and self.counts[b_id] == 1: cw, cs = 0, 0
             
             self.wood -= cw
             self.stone -= cs
 
-            self.virtuosity += stats.get('virt', 0)
-            self.pollution_total += stats.get('poll', 0)
+            self.virtuosity += VIRT_ON_BUILD[b_id]
+            self.pollution_total += POLL_ON_BUILD[b_id]
             self.stats_built[b_name] = self.stats_built.get(b_name, 0) + 1
             
             if verbose:
@@ -223,34 +261,53 @@ class TerrapolisGame:
             if verbose:
                 print(f"\n[ALERTE] INNONDATION au Tour {self.turn} !")
             
-            rows, cols = np.where(self.occupied_mask)
+            # Bâtiments adjacents à la rivière (masque précalculé par TerrainAnalysis)
+            rows, cols = np.nonzero(self.occupied_mask & self.terrain.adjacent['river'])
             damage_count = 0
-            for i in range(len(rows)):
-                rr, cc = rows[i], cols[i]
-                adj_river = False
-                for dr, dc in [(-1,0), (1,0), (0,-1), (0,1)]:
-                    nr, nc = rr+dr, cc+dc
-                    if 0 <= nr < MAP_H and 0 <= nc < MAP_W:
-                        if self.river_mask[nr, nc]: adj_river = True; break
-                
-                if adj_river:
-                    destroyed = self.grid_types[rr, cc]
-                    if destroyed:
-                        if verbose:
-                            print(f"DÉSASTRE : {destroyed} en ({rr}, {cc}) a été détruit par l'inondation !")
-                        
-                        self.occupied_mask[rr, cc] = False
-                        self.grid_types[rr, cc] = ""
-                        self.pollution_total += 200 
-                        self.virtuosity -= BUILDINGS[destroyed].get('virt', 0)
-                        self.stats_lost_flood[destroyed] = self.stats_lost_flood.get(destroyed, 0) + 1
-                        damage_count += 1
-            
+            for rr, cc in zip(rows.tolist(), cols.tolist()):
+                destroyed_id = self.grid_types[rr, cc]
+                destroyed = BUILDING_NAMES[destroyed_id]
+                if verbose:
+                    print(f"DÉSASTRE : {destroyed} en ({rr}, {cc}) a été détruit par l'inondation !")
+
+                self._set_cell(rr, cc, NO_BUILDING)
+                if flooded is None: flooded = []
+                flooded.append((rr, cc, destroyed_id))
+                self.pollution_total += 200
+                self.virtuosity -= VIRT_ON_BUILD[destroyed_id]
+                self.stats_lost_flood[destroyed] = self.stats_lost_flood.get(destroyed, 0) + 1
+                damage_count += 1
+
             if verbose:
                 if damage_count == 0: print("Aucun bâtiment touché.")
                 else: print(f"Bilan : {damage_count} bâtiment(s) perdu(s).")
 
         self.turn += 1
+        return (action, previous, prev_cell, flooded)
 
-        
-        return self.virtuosity - self.pollution_total
\ No newline at end of file
+    def undo(self, record):
+        """Annule un apply() : bâtiments inondés, action, ressources, stats et tour."""
+        action, previous, prev_cell, flooded = record
+        b_name, r, c = action
+        self.turn -= 1
+
+        if flooded:
+            for rr, cc, destroyed_id in flooded:
+                self._set_cell(rr, cc, destroyed_id)
+                _decrement(self.stats_lost_flood, BUILDING_NAMES[destroyed_id])
+
+        if b_name == "DESTROY":
+            if prev_cell != NO_BUILDING:
+                self._set_cell(r, c, prev_cell)
+                _decrement(self.stats_lost_player, BUILDING_NAMES[prev_cell])
+        elif b_name != "WAIT":
+            self._set_cell(r, c, prev_cell)
+            _decrement(self.stats_built, b_name)
+
+        self.wood, self.stone, self.virtuosity, self.pollution_total = previous
+
+
+def _decrement(stats, key):
+    # Les compteurs ne sont créés qu'à 1 : une clé retombée à 0 n'existait pas avant.
+    if stats[key] <= 1: del stats[key]
+    else: stats[key] -= 1
@@ -6,7 +6,9 @@ import random
 import os
 from tqdm import tqdm
 from torch.utils.tensorboard import SummaryWriter
-from terrapolis_logic import TerrapolisGame, MAP_H, MAP_W, TOTAL_STEPS, BUILDINGS
+from terrapolis_logic import TerrapolisGame, MAP_H, MAP_W, TOTAL_STEPS
+from rules_manager import get_rules
+from terrapolis_batch import BatchTerrapolisGame
 
 class CityCNN(nn.Module):
     def __init__(self, conf):
@@ -14,7 +16,7 @@ class CityCNN(nn.Module):
         self.path_save = conf["path_save"]
         
         # Entrée CNN : 4 Terrains + Batiments + Occupé
-        self.num_buildings = len(BUILDINGS)
+        self.num_buildings = get_rules().count - 1
         input_channels = 4 + self.num_buildings + 1
         
         self.conv1 = nn.Conv2d(input_channels, 32, kernel_size=3, padding=1)
@@ -49,27 +51,54 @@ class CityCNN(nn.Module):
         return self.fc2(x)
 
     def encode_state(self, game):
-        layers = []
+        np_layers = np.empty((4 + self.num_buildings + 1, MAP_H, MAP_W), dtype=np.float32)
         # Terrains
-        layers.append(game.mountain_mask)
-        layers.append(game.forest_mask)
-        layers.append(game.river_mask)
-        layers.append(game.plain_mask)
+        np_layers[0] = game.mountain_mask
+        np_layers[1] = game.forest_mask
+        np_layers[2] = game.river_mask
+        np_layers[3] = game.plain_mask
         
-        # Batiments
-        for b_name in BUILDINGS.keys():
-            layer = np.zeros((MAP_H, MAP_W))
-            layer[game.grid_types == b_name] = 1.0
-            layers.append(layer)
+        # Batiments (one-hot sur la grille d'IDs)
+        np_layers[4:4 + self.num_buildings] = game.grid_types[None] == self._building_ids()[:, None, None]
             
         # Occupation
-        layers.append(game.occupied_mask.astype(float))
+        np_layers[-1] = game.occupied_mask
         
-        np_layers = np.array(layers, dtype=np.float32)
-        map_tensor = torch.tensor(np_layers).unsqueeze(0) 
+        map_tensor = torch.from_numpy(np_layers).unsqueeze(0) 
         res_tensor = torch.tensor([[game.wood/1000.0, game.stone/1000.0]], dtype=torch.float32)
         return map_tensor, res_tensor
 
+    def encode_batch(self, batch):
+        """Équivalent de encode_state pour un BatchTerrapolisGame (N états en un seul tenseur)."""
+        n = batch.n
+        terrain = np.stack([batch.mountain_mask, batch.forest_mask, batch.river_mask, batch.plain_mask]).astype(np.float32)
+        b_ids = self._building_ids()
+
+        np_layers = np.empty((n, 4 + self.num_buildings + 1, MAP_H, MAP_W), dtype=np.float32)
+        np_layers[:, :4] = terrain
+        np_layers[:, 4:4 + self.num_buildings] = batch.grid[:, None] == b_ids[None, :, None, None]
+        np_layers[:, -1] = batch.occupied_mask
+
+        map_tensor = torch.from_numpy(np_layers)
+        res_tensor = torch.from_numpy(np.stack([batch.wood / 1000.0, batch.stone / 1000.0], axis=1).astype(np.float32))
+        return map_tensor, res_tensor
+
+    def _building_ids(self):
+        # Canaux bâtiments : IDs 1..N de la grille uint8, dans l'ordre de Rules.json.
+        # Calculé à la demande pour rester compatible avec les modèles déjà sauvegardés.
+        if not hasattr(self, 'building_ids'):
+            self.building_ids = np.arange(1, get_rules().count, dtype=np.uint8)
+        return self.building_ids
+
+    def evaluate_actions(self, game, actions, device):
+        """Simule toutes les actions candidates en un seul lot et retourne (valeurs, map_tensor, res_tensor)."""
+        batch = BatchTerrapolisGame.from_game(game, len(actions))
+        batch.step(actions)
+        bm, br = self.encode_batch(batch)
+        with torch.no_grad():
+            preds = self(bm.to(device), br.to(device))
+        return preds, bm, br
+
     def train_self_play(self, num_episodes, device, optimizer, start_epsilon=1.0, gamma=0.99):
         """
         Entraînement avec GAMMA, DROPOUT et Intervalle de Confiance.
@@ -102,24 +131,17 @@ class CityCNN(nn.Module):
                 # --- Epsilon Greedy ---
                 if random.random() < epsilon:
                     chosen = random.choice(actions)
-                    virtual = game.copy(); virtual.step(chosen)
-                    mt, rt = self.encode_state(virtual)
+                    undo = game.apply(chosen)
+                    mt, rt = self.encode_state(game)
+                    game.undo(undo)
                 else:
                     sample = actions if len(actions)<60 else random.sample(actions, 60)
-                    batch_m, batch_r = [], []
-                    for a in sample:
-                        v = game.copy(); v.step(a)
-                        m, r = self.encode_state(v)
-                        batch_m.append(m); batch_r.append(r)
                     
-                    if batch_m:
-                        bm = torch.cat(batch_m).to(device)
-                        br = torch.cat(batch_r).to(device)
-                        with torch.no_grad():
-                            preds = self(bm, br)
+                    if sample:
+                        preds, bm, br = self.evaluate_actions(game, sample, device)
                         best_idx = torch.argmax(preds).item()
                         chosen = sample[best_idx]
-                        mt, rt = batch_m[best_idx], batch_r[best_idx]
+                        mt, rt = bm[best_idx:best_idx+1], br[best_idx:best_idx+1]
                     else:
                         chosen = ("WAIT", -1, -1)
                         mt, rt = self.encode_state(game)
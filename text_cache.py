@@ -0,0 +1,50 @@
+# text_cache.py
+import time
+from collections import OrderedDict
+
+
+class TextCache:
+    """
+    Surfaces de texte déjà rendues, indexées par (police, texte, antialias, couleur, fond),
+    avec éviction LRU. Les surfaces renvoyées sont partagées : on les blit, on ne les modifie pas.
+    max_entries = 0 désactive le cache (rendu direct, pour comparer).
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._surfaces = OrderedDict()
+        self.reset_stats()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+        self.render_ms = 0.0   # Temps passé dans font.render (rendus réels uniquement)
+
+    def render(self, font, text, antialias, color, background=None):
+        """Équivalent de font.render(...), servi depuis le cache quand c'est possible."""
+        key = (font, text, antialias, tuple(color), None if background is None else tuple(background))
+        surf = self._surfaces.get(key)
+        if surf is not None:
+            self._surfaces.move_to_end(key)
+            self.hits += 1
+            return surf
+
+        self.misses += 1
+        start = time.perf_counter()
+        surf = font.render(text, antialias, color, background) if background is not None else font.render(text, antialias, color)
+        self.render_ms += (time.perf_counter() - start) * 1000
+        if self.max_entries > 0:
+            self._surfaces[key] = surf
+            if len(self._surfaces) > self.max_entries:
+                self._surfaces.popitem(last=False)
+        return surf
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def clear(self):
+        self._surfaces.clear()
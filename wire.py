@@ -0,0 +1,95 @@
+# wire.py
+import struct
+
+import numpy as np
+
+# Format binaire compact, négocié au READY (READY,BINARY) ; le texte CSV reste le format par défaut.
+# Tous les messages commencent par le même en-tête fixe : "TP", version, type, séquence.
+MAGIC = b"TP"
+VERSION = 1
+HEADER = struct.Struct("<2sBBI")
+RESOURCES = struct.Struct("<iii")      # Bois, pierre, virtuosité (entiers, comme l'affichage)
+COUNT = struct.Struct("<H")
+DELTA_CELL = np.dtype([("index", "<u2"), ("code", "u1")])
+
+# Types de messages serveur -> client
+MSG_FULL = 1     # Grille complète : ressources, nombre de cases, une case = 1 octet (uint8)
+MSG_DELTA = 2    # Cases modifiées : ressources, nombre de cases, (index uint16, code uint8) par case
+
+# Types de commandes client -> serveur, et leur équivalent texte (traité par engine.py)
+CMD_BUILD = 10        # index uint16, type uint8   -> BUILD,index,type
+CMD_AR_BUILD = 11     # index uint16, type uint8   -> AR,index,type
+CMD_DESTROY = 12      # index uint16               -> DESTROY,index
+CMD_IA_TRIGGER = 13   #                            -> IA_TRIGGER
+CMD_GET_MAP = 14      #                            -> GET_MAP
+CMD_KEYFRAME = 15     #                            -> KEYFRAME
+CMD_RESTART = 16      #                            -> RESTART
+_COMMANDS = {
+    CMD_BUILD: ("BUILD", struct.Struct("<HB")),
+    CMD_AR_BUILD: ("AR", struct.Struct("<HB")),
+    CMD_DESTROY: ("DESTROY", struct.Struct("<H")),
+    CMD_IA_TRIGGER: ("IA_TRIGGER", None),
+    CMD_GET_MAP: ("GET_MAP", None),
+    CMD_KEYFRAME: ("KEYFRAME", None),
+    CMD_RESTART: ("RESTART", None),
+}
+_COMMAND_IDS = {name: kind for kind, (name, _) in _COMMANDS.items()}
+
+
+def is_binary(data):
+    return data[:2] == MAGIC
+
+
+def _resources(resources):
+    return RESOURCES.pack(*(int(resources.get(k, 0)) for k in ("wood", "stones", "virtuosity")))
+
+
+# --- ÉTAT (SERVEUR -> CLIENT) ---
+
+def encode_full(seq, codes, resources):
+    codes = np.asarray(codes, dtype=np.uint8).ravel()
+    return (HEADER.pack(MAGIC, VERSION, MSG_FULL, seq) + _resources(resources)
+            + COUNT.pack(codes.size) + codes.tobytes())
+
+
+def encode_delta(seq, indices, codes, resources):
+    cells = np.empty(len(indices), dtype=DELTA_CELL)
+    cells["index"], cells["code"] = indices, codes
+    return (HEADER.pack(MAGIC, VERSION, MSG_DELTA, seq) + _resources(resources)
+            + COUNT.pack(cells.size) + cells.tobytes())
+
+
+def decode_state(data):
+    """Décodeur de référence côté client : (type, seq, (bois, pierre, virtuosité), cases)."""
+    magic, version, kind, seq = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION: raise ValueError("en-tête binaire invalide")
+    offset = HEADER.size
+    resources = RESOURCES.unpack_from(data, offset); offset += RESOURCES.size
+    (count,) = COUNT.unpack_from(data, offset); offset += COUNT.size
+    if kind == MSG_FULL:
+        cells = np.frombuffer(data, dtype=np.uint8, count=count, offset=offset)
+    elif kind == MSG_DELTA:
+        cells = np.frombuffer(data, dtype=DELTA_CELL, count=count, offset=offset)
+    else:
+        raise ValueError(f"type de message d'état inconnu : {kind}")
+    return kind, seq, resources, cells
+
+
+# --- COMMANDES (CLIENT -> SERVEUR) ---
+
+def encode_command(text):
+    """Commande texte (ex: "BUILD,42,6") -> paquet binaire (côté client)."""
+    name, *args = text.split(",")
+    kind = _COMMAND_IDS[name]
+    body = _COMMANDS[kind][1]
+    return HEADER.pack(MAGIC, VERSION, kind, 0) + (body.pack(*map(int, args)) if body else b"")
+
+
+def decode_command(data):
+    """Paquet binaire -> commande texte équivalente (le moteur n'a qu'un seul analyseur)."""
+    magic, version, kind, _ = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or kind not in _COMMANDS:
+        raise ValueError("commande binaire invalide")
+    name, body = _COMMANDS[kind]
+    if body is None: return name
+    return ",".join([name] + [str(v) for v in body.unpack_from(data, HEADER.size)])